@@ -0,0 +1,108 @@
+# File: anytime.py
+# Anytime forest evaluation: a per-request latency budget traded against the
+# last decimal of the premium.
+#
+# The trees are evaluated in chunks of ANYTIME_CHUNK_TREES, in estimator
+# order, keeping a running sum per row.  Once min_trees have been used,
+# evaluation stops after a chunk when
+#   * the next chunk would end past the deadline (estimated from the chunk
+#     just evaluated), or
+#   * every row's running mean has converged: the standard error of the mean
+#     over the trees used so far is within `tolerance` (a fraction) of it.
+# The prediction is the mean over the trees used.  With all trees it is the
+# engine's full prediction, bit for bit (same summation order).
+#
+# Callers opt in per request with query parameters on /predict and
+# /predict_batch, e.g. ?max_latency_ms=5&min_trees=50&tolerance=0.01; the
+# budget runs from the start of the view.  Engines without per-tree access
+# (a gradient-boosted surrogate) are scored in full.
+
+import time
+
+import numpy as np
+
+import config
+from forest_engine import n_trees, per_tree_values
+
+PARAMS = ("max_latency_ms", "min_trees", "tolerance")
+
+
+class Budget:
+    """Stopping rules of one request; records the fewest trees any call under it used."""
+
+    def __init__(self, deadline_ns=None, min_trees=1, tolerance=0.0):
+        self.deadline_ns = deadline_ns  # time.perf_counter_ns() value, or None for no deadline
+        self.min_trees = min_trees
+        self.tolerance = tolerance
+        self.trees_used = None
+
+    def record(self, n_trees):
+        if n_trees is not None:
+            self.trees_used = n_trees if self.trees_used is None else min(self.trees_used, n_trees)
+
+
+def _param(params, name, kind, default, low):
+    value = params.get(name)
+    if value in (None, ""):
+        return default
+    try:
+        value = kind(value)
+    except ValueError:
+        raise ValueError(f"{name} must be a number, got {value!r}") from None
+    if not value >= low:  # also rejects NaN
+        raise ValueError(f"{name} must be >= {low}, got {value!r}")
+    return value
+
+
+def parse_budget(params, started_ns):
+    """Budget from request parameters (a mapping of strings), or None when the
+    request sets none of PARAMS; ValueError on a malformed value."""
+    if all(params.get(name) in (None, "") for name in PARAMS):
+        return None
+    max_latency_ms = _param(params, "max_latency_ms", float, None, 0.0)
+    return Budget(
+        deadline_ns=None if max_latency_ms is None else started_ns + int(max_latency_ms * 1e6),
+        min_trees=_param(params, "min_trees", int, 1, 1),
+        tolerance=_param(params, "tolerance", float, 0.0, 0.0)
+    )
+
+
+def predict(engine, X, budget, chunk_trees=None):
+    """(predictions, trees used) for X under `budget`, recorded on it too."""
+    total_trees = n_trees(engine)
+    if total_trees is None:
+        return engine.predict(X), None
+    chunk_trees = chunk_trees or config.ANYTIME_CHUNK_TREES
+    X = np.asarray(X)
+    total = np.zeros(len(X))
+    squares = np.zeros(len(X)) if budget.tolerance > 0 else None
+    used = 0
+    while used < total_trees:
+        start_ns = time.perf_counter_ns()
+        stop = min(total_trees, max(budget.min_trees, used + chunk_trees))
+        chunk = per_tree_values(engine, X, used, stop)
+        for t in range(chunk.shape[1]):  # same accumulation order as a full predict
+            total += chunk[:, t]
+        if squares is not None:
+            squares += np.square(chunk).sum(axis=1)
+        used = stop
+        if used == total_trees:
+            break
+        now = time.perf_counter_ns()
+        next_ns = (now - start_ns) * min(chunk_trees, total_trees - used) / chunk.shape[1]
+        if budget.deadline_ns is not None and now + next_ns > budget.deadline_ns:
+            break
+        if squares is not None and _converged(total, squares, used, budget.tolerance):
+            break
+    total /= used
+    budget.record(used)
+    return total, used
+
+
+def _converged(total, squares, k, tolerance):
+    """Standard error of every row's mean over k trees within tolerance * |mean|."""
+    if k < 2:
+        return False
+    mean = total / k
+    variance = np.maximum(squares - k * mean * mean, 0.0) / (k - 1)
+    return bool(np.all(np.sqrt(variance / k) <= tolerance * np.abs(mean)))
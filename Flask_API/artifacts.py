@@ -0,0 +1,20 @@
+# File: artifacts.py
+# Identify the model artifacts on disk, so derived artifacts (compiled grids,
+# caches) can tell when best_model.pkl / scaler.pkl have been replaced.
+
+import hashlib
+import os
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(BASE_DIR, "best_model.pkl")
+SCALER_PATH = os.path.join(BASE_DIR, "scaler.pkl")
+
+
+def artifact_digest(*paths):
+    """sha256 over the contents of `paths` (default: model + scaler), hex."""
+    digest = hashlib.sha256()
+    for path in paths or (MODEL_PATH, SCALER_PATH):
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()
@@ -0,0 +1,194 @@
+# File: asgi_app.py
+# asyncio-native (ASGI) server for the same /, /health, /predict and /metrics
+# contract as flask_app.py.
+#
+# Connections are coroutines on one event loop, so thousands of idle
+# keep-alive clients cost no threads.  The CPU-bound part (predict_payload:
+# featurize, cache/grid lookup, model) runs on a small thread pool, and at
+# most ASGI_MAX_PENDING requests may wait for it - the rest wait on the
+# semaphore without holding a thread.
+#
+#   uvicorn asgi_app:app --host 0.0.0.0 --port 8000
+
+import asyncio
+import functools
+import json
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+
+import binary_codec
+import config
+import flask_app  # loads model/scaler/engine/grid/cache once
+from flask_app import home_payload, health_payload, predict_payload, prefers_premium, scoring_options
+from metrics import NULL_TIMER, StageTimer, server_timing
+
+executor = ThreadPoolExecutor(max_workers=config.ASGI_EXECUTOR_THREADS, thread_name_prefix="predict")
+# predict_payload, or a sampled cProfile wrapper around it (profiling.py)
+_score = (predict_payload if flask_app.profiler is None
+          else functools.partial(flask_app.profiler.call, predict_payload))
+_PREMIUM_TYPE = binary_codec.PREMIUM_TYPE.encode()
+_pending = None  # asyncio.Semaphore, created on the running loop
+
+
+async def _read_body(receive, limit):
+    chunks, size = [], 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return None
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > limit:
+            raise ValueError(f"Request body exceeds {limit} bytes")
+        chunks.append(chunk)
+        if not message.get("more_body", False):
+            return b"".join(chunks)
+
+
+async def _send(send, payload, content_type, status=200, headers=()):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", content_type),
+                    (b"content-length", str(len(payload)).encode()), *headers]
+    })
+    await send({"type": "http.response.body", "body": payload})
+
+
+async def _send_json(send, body, status=200):
+    await _send(send, json.dumps(body).encode(), b"application/json", status)
+
+
+def _header(scope, wanted):
+    for name, value in scope.get("headers", []):
+        if name == wanted:
+            return value
+    return b""
+
+
+def _is_json(mimetype):
+    return mimetype == b"application/json" or (
+        mimetype.startswith(b"application/") and mimetype.endswith(b"+json"))
+
+
+def _wants_premium(scope, binary_request):
+    """Same q-value negotiation as flask_app.wants_premium."""
+    accept = parse_accept_header(_header(scope, b"accept").decode("latin-1"), MIMEAccept)
+    return prefers_premium(accept, binary_request)
+
+
+def _record_error(kind):
+    if flask_app.metrics is not None:
+        flask_app.metrics.error("/predict", kind)
+
+
+async def _predict(scope, receive, send):
+    metrics = flask_app.metrics
+    if metrics is None:
+        timer = StageTimer() if config.SERVER_TIMING else NULL_TIMER
+        return await _handle_predict(scope, receive, send, timer)
+    timer = metrics.start("/predict")
+    status = 500
+    try:
+        status = await _handle_predict(scope, receive, send, timer)
+    finally:
+        metrics.finish("/predict", status, timer)
+
+
+async def _handle_predict(scope, receive, send, timer):
+    """Serve one /predict call; returns the response status."""
+    global _pending
+    started_ns = time.perf_counter_ns()
+    mimetype = _header(scope, b"content-type").split(b";")[0].strip().lower()
+    binary = mimetype == binary_codec.RECORD_TYPE.encode()
+    if not binary and not _is_json(mimetype):
+        _record_error("content_type")
+        await _send_json(send, {
+            "success": False,
+            "error": "Request must be JSON with header Content-Type: application/json"
+        }, 400)
+        return 400
+    try:
+        raw = await _read_body(receive, config.ASGI_MAX_BODY_BYTES)
+    except ValueError as e:
+        _record_error("body_too_large")
+        await _send_json(send, {"success": False, "error": str(e)}, 413)
+        return 413
+    if raw is None:
+        return 499  # client went away
+    try:
+        data = binary_codec.decode_record(raw) if binary else json.loads(raw)
+    except ValueError as e:
+        _record_error("decode")
+        error = str(e) if binary else f"Invalid JSON: {e}"
+        await _send_json(send, {"success": False, "error": error}, 400)
+        return 400
+    try:
+        query = urllib.parse.parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        budget, spread = scoring_options({k: v[0] for k, v in query.items()}, started_ns)
+    except ValueError as e:
+        _record_error("options")
+        await _send_json(send, {"success": False, "error": str(e)}, 400)
+        return 400
+    timer.mark("parse")
+
+    if _pending is None:
+        _pending = asyncio.Semaphore(config.ASGI_MAX_PENDING)
+    try:
+        async with _pending:
+            loop = asyncio.get_running_loop()
+            body, status = await loop.run_in_executor(executor, _score, data, timer, budget, spread)
+    except Exception as e:
+        flask_app.app.logger.exception("Prediction error")
+        _record_error(type(e).__name__)
+        body, status = {"success": False, "error": str(e)}, 500
+    if status == 400:
+        _record_error("validation")
+    if status == 200 and spread is None and _wants_premium(scope, binary):
+        payload, content_type = binary_codec.PREMIUM.pack(body["prediction"]), _PREMIUM_TYPE
+    else:
+        payload, content_type = json.dumps(body).encode(), b"application/json"
+    timer.mark("serialize")
+    timing = server_timing(timer) if config.SERVER_TIMING else ""
+    headers = [(b"server-timing", timing.encode())] if timing else []
+    if budget is not None and budget.trees_used is not None:
+        headers.append((b"x-trees-used", str(budget.trees_used).encode()))
+    await _send(send, payload, content_type, status, headers)
+    return status
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            executor.shutdown(wait=True)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await _lifespan(receive, send)
+    if scope["type"] != "http":
+        return
+
+    path, method = scope["path"], scope["method"]
+    if path == "/predict" and method == "POST":
+        return await _predict(scope, receive, send)
+    if path == "/" and method == "GET":
+        return await _send_json(send, home_payload())
+    if path == "/health" and method == "GET":
+        return await _send_json(send, health_payload())
+    if path == "/metrics" and method == "GET":
+        if flask_app.metrics is None:
+            return await _send_json(send, {"enabled": False})
+        return await _send(send, flask_app.metrics.render().encode(), b"text/plain; version=0.0.4")
+    if path in ("/", "/health", "/predict", "/metrics"):
+        return await _send_json(send, {"success": False, "error": "Method not allowed"}, 405)
+    await _send_json(send, {"success": False, "error": "Not found"}, 404)
@@ -0,0 +1,110 @@
+# File: benchmarks/bench_asgi_vs_flask.py
+# Throughput and tail latency of /predict under many concurrent keep-alive
+# connections: gunicorn + Flask (sync workers) vs uvicorn + asgi_app, both
+# with the same number of worker processes (default: one per core).
+#
+# A closed loop per connection: each client coroutine sends its next request
+# as soon as the previous answer arrives.
+# Run from Flask_API/:  python benchmarks/bench_asgi_vs_flask.py --concurrency 16 256 2048
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+from http_client import HttpConnection
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PAYLOAD = json.dumps({
+    "Age": 45, "Diabetes": 0, "Blood_Pressure_Problems": 0, "Any_Transplants": 0,
+    "Any_Chronic_Diseases": 0, "Height": 155, "Weight": 57, "Known_Allergies": 0,
+    "History_of_Cancer_in_Family": 0, "Number_of_Major_Surgeries": 0
+}).encode()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(kind, workers, port):
+    if kind == "gunicorn":
+        cmd = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "-w", str(workers),
+               "-b", f"127.0.0.1:{port}", "flask_app:app"]
+    else:
+        cmd = [sys.executable, "-m", "uvicorn", "asgi_app:app", "--workers", str(workers),
+               "--host", "127.0.0.1", "--port", str(port), "--no-access-log",
+               "--backlog", "4096", "--log-level", "warning"]
+    env = dict(os.environ, LOG_LEVEL="WARNING")
+    proc = subprocess.Popen(cmd, cwd=API_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=5).read()
+            return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise SystemExit(f"{kind} did not come up")
+
+
+async def client(port, stop_at, latencies, errors):
+    conn = HttpConnection("127.0.0.1", port)
+    while time.perf_counter() < stop_at:
+        try:
+            status, _, elapsed = await conn.request("POST", "/predict", PAYLOAD)
+            if status == 200:
+                latencies.append(elapsed)
+            else:
+                errors.append(status)
+        except (OSError, asyncio.IncompleteReadError, ValueError, IndexError):
+            errors.append("connection")
+            await conn.close()
+            await asyncio.sleep(0.01)
+    await conn.close()
+
+
+async def run_load(port, concurrency, duration):
+    latencies, errors = [], []
+    start = time.perf_counter()
+    stop_at = start + duration
+    await asyncio.gather(*(client(port, stop_at, latencies, errors) for _ in range(concurrency)))
+    wall = time.perf_counter() - start
+    latencies.sort()
+
+    def pct(q):
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000.0 if latencies else float("nan")
+    return {"rps": len(latencies) / wall, "p50_ms": pct(0.50), "p99_ms": pct(0.99), "errors": len(errors)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="gunicorn+Flask vs uvicorn+ASGI under concurrent load")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[16, 256, 2048])
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per measurement")
+    args = parser.parse_args()
+
+    print(f"workers={args.workers} (same for both servers), {args.duration:.0f}s per run")
+    for kind in ("gunicorn", "uvicorn"):
+        port = free_port()
+        proc = start_server(kind, args.workers, port)
+        try:
+            asyncio.run(run_load(port, 8, 1.0))  # warm-up
+            for concurrency in args.concurrency:
+                r = asyncio.run(run_load(port, concurrency, args.duration))
+                print(f"{kind:<9} conns={concurrency:<5} {r['rps']:8.1f} req/s  p50={r['p50_ms']:8.1f} ms  "
+                      f"p99={r['p99_ms']:8.1f} ms  errors={r['errors']}")
+        finally:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# File: benchmarks/bench_encoding.py
+# Parse + serialize cost of JSON vs the fixed binary layout (binary_codec.py),
+# for one row and for batches, plus whole /predict requests through Flask.
+# Run: python benchmarks/bench_encoding.py
+
+import json
+
+from common import insurance_records, time_per_call
+
+import numpy as np
+
+import binary_codec
+import flask_app
+from validation import parse_records
+
+
+def batch_rows(records, expected, n):
+    batch = (records * (n // len(records) + 1))[:n]
+    preds = (expected * (n // len(expected) + 1))[:n]
+    json_batch, bin_batch = json.dumps(batch).encode(), binary_codec.encode_records(batch)
+    json_resp = {"success": True, "count": n, "predictions": preds, "errors": []}
+    pred_array = np.asarray(preds)  # what the server holds after scoring
+    repeat = max(2, 20000 // n)
+    return [
+        (f"{n} rows: parse request", lambda: parse_records(json.loads(json_batch)),
+         lambda: binary_codec.decode_records(bin_batch), len(json_batch), len(bin_batch), repeat),
+        (f"{n} rows: serialize response", lambda: json.dumps(json_resp),
+         lambda: binary_codec.encode_premiums(pred_array), len(json.dumps(json_resp)), 8 * n, repeat),
+    ]
+
+
+def main():
+    records = insurance_records()
+    client = flask_app.app.test_client()
+
+    # ---- Exactness: binary and JSON give the same predictions ----
+    expected = client.post("/predict_batch", json=records).get_json()["predictions"]
+    got = client.post("/predict_batch", data=binary_codec.encode_records(records),
+                      content_type=binary_codec.RECORD_TYPE).data
+    assert np.array_equal(binary_codec.decode_premiums(got), expected)
+
+    print(f"{'stage':<34}{'JSON (us)':>12}{'binary (us)':>14}{'bytes J/B':>14}")
+
+    # ---- Single row: request body in, response body out ----
+    rec = records[0]
+    json_req, bin_req = json.dumps(rec).encode(), binary_codec.encode_record(rec)
+    body = {"success": True, "prediction": expected[0],
+            "derived": {"BMI": 23.73, "Age_Group_30-39": 0, "Age_Group_40-49": 1,
+                        "Age_Group_50-59": 0, "Age_Group_60+": 0}}
+    rows = [
+        ("1 row: parse request", lambda: json.loads(json_req), lambda: binary_codec.decode_record(bin_req),
+         len(json_req), len(bin_req)),
+        ("1 row: serialize response", lambda: json.dumps(body), lambda: binary_codec.PREMIUM.pack(expected[0]),
+         len(json.dumps(body)), binary_codec.PREMIUM.size),
+    ]
+
+    # ---- Batches: parse + coerce to the (n, 10) inputs, and the predictions back ----
+    for n in (100, 10000):
+        rows += batch_rows(records, expected, n)
+
+    for label, json_fn, bin_fn, json_bytes, bin_bytes, *repeat in rows:
+        repeat = repeat[0] if repeat else 2000
+        t_json = time_per_call(json_fn, repeat)
+        t_bin = time_per_call(bin_fn, repeat)
+        print(f"{label:<34}{t_json * 1e6:>12.1f}{t_bin * 1e6:>14.1f}{json_bytes:>10}/{bin_bytes}")
+
+    # ---- Whole /predict request through Flask (cache hit, so encoding dominates) ----
+    t_json = time_per_call(lambda: client.post("/predict", data=json_req, content_type="application/json"), 500)
+    t_bin = time_per_call(lambda: client.post("/predict", data=bin_req, content_type=binary_codec.RECORD_TYPE), 500)
+    print(f"{'/predict request (test client)':<34}{t_json * 1e6:>12.1f}{t_bin * 1e6:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# File: benchmarks/bench_intervals.py
+# Cost of the per-tree spread (intervals.py) on top of a plain prediction,
+# at several batch sizes, with the flat engine:
+#
+#   predict      engine.predict (mean only)
+#   std          intervals.predict with ?std=1
+#   quantiles    intervals.predict with ?quantiles=0.05,0.5,0.95
+#   both         std + the three quantiles
+#   estimators   the same statistics by calling every model.estimators_[i].predict
+#
+# Variants are timed in interleaved rounds (best round each), so drift in the
+# machine's speed hits them all alike.
+#
+# Run: python benchmarks/bench_intervals.py [--sizes 1 10 256 1000] [--rounds 15]
+
+import argparse
+import time
+
+from common import insurance_records, load_artifacts
+
+import numpy as np
+
+import intervals
+from features import REQUIRED_KEYS, build_feature_matrix, scale_features
+from forest_engine import FlatForest
+
+QUANTILES = (0.05, 0.5, 0.95)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-tree spread overhead vs a plain prediction")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 256, 1000])
+    parser.add_argument("--rounds", type=int, default=15)
+    args = parser.parse_args()
+
+    model, scaler = load_artifacts()
+    model.set_params(n_jobs=1)
+    columns = list(model.feature_names_in_)
+    engine = FlatForest.from_model(model)
+    records = insurance_records()
+    table = np.array([[rec[k] for k in REQUIRED_KEYS] for rec in records], dtype=np.float64)
+    spreads = {
+        "std": intervals.Spread(std=True),
+        "quantiles": intervals.Spread(QUANTILES),
+        "both": intervals.Spread(QUANTILES, std=True),
+    }
+
+    print(f"{'rows':>7}{'predict':>12}" + "".join(f"{name:>18}" for name in spreads) + f"{'estimators':>14}")
+    for n in args.sizes:
+        raw = table[np.random.default_rng(0).integers(0, len(table), n)]
+        X = scale_features(build_feature_matrix(raw, columns), columns, scaler)
+
+        # ---- Exactness: the mean is the engine's prediction ----
+        mean, _, _ = intervals.predict(engine, X, spreads["both"])
+        assert np.array_equal(mean, engine.predict(X))
+
+        def per_estimator():
+            values = np.column_stack([est.predict(X.astype(np.float32)) for est in model.estimators_])
+            return values.mean(axis=1), values.std(axis=1), np.quantile(values, QUANTILES, axis=1)
+
+        calls = {"predict": lambda: engine.predict(X)}
+        for name, spread in spreads.items():
+            calls[name] = lambda spread=spread: intervals.predict(engine, X, spread)
+        best = interleaved(calls, args.rounds, repeat=max(1, 200 // n))
+        best["estimators"] = interleaved({"estimators": per_estimator}, 3, repeat=1)["estimators"]
+        plain = best["predict"]
+        cells = [f"{_fmt(best[name]):>10} {best[name] / plain - 1:>+6.1%}" for name in spreads]
+        print(f"{n:>7}{_fmt(plain):>12}" + "".join(f"{c:>18}" for c in cells) + f"{_fmt(best['estimators']):>14}")
+
+
+def interleaved(calls, rounds, repeat):
+    """{name: best seconds per call over `rounds` rounds, each timing every call in turn}."""
+    best = dict.fromkeys(calls, float("inf"))
+    for _ in range(rounds):
+        for name, fn in calls.items():
+            start = time.perf_counter()
+            for _ in range(repeat):
+                fn()
+            best[name] = min(best[name], (time.perf_counter() - start) / repeat)
+    return best
+
+
+def _fmt(seconds):
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f} ms"
+    return f"{seconds * 1e6:.0f} us"
+
+
+if __name__ == "__main__":
+    main()
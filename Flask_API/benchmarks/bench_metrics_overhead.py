@@ -0,0 +1,72 @@
+# File: benchmarks/bench_metrics_overhead.py
+# Per-request cost of the /metrics instrumentation (metrics.py): start, one
+# mark per stage, finish - measured alone and around the real predict_payload.
+# Run: python benchmarks/bench_metrics_overhead.py
+
+import threading
+
+from common import insurance_records, time_per_call
+
+import flask_app
+from metrics import NULL_TIMER, STAGES, Metrics
+
+
+def main():
+    record = insurance_records()[0]
+    metrics = Metrics()
+
+    def instrumentation_only():
+        timer = metrics.start("/predict")
+        for stage in STAGES:
+            timer.mark(stage)
+        metrics.finish("/predict", 200, timer)
+
+    def null_marks():
+        for stage in STAGES:
+            NULL_TIMER.mark(stage)
+
+    def payload_plain():
+        flask_app.predict_payload(record)
+
+    def payload_instrumented():
+        timer = metrics.start("/predict")
+        flask_app.predict_payload(record, timer)
+        timer.mark("serialize")
+        metrics.finish("/predict", 200, timer)
+
+    repeat = 20000
+    bare = time_per_call(instrumentation_only, repeat)
+    off = time_per_call(null_marks, repeat)
+    plain = time_per_call(payload_plain, repeat)
+    instrumented = time_per_call(payload_instrumented, repeat)
+    print(f"start + {len(STAGES)} marks + finish:   {bare * 1e6:6.2f} us")
+    print(f"metrics off ({len(STAGES)} no-op marks):   {off * 1e6:6.2f} us")
+    print(f"predict_payload (cache hit):      {plain * 1e6:6.2f} us plain, "
+          f"{instrumented * 1e6:6.2f} us instrumented (+{(instrumented - plain) * 1e6:.2f} us)")
+
+    # Recording from several threads at once needs no lock: each thread has its own shard
+    def hammer():
+        for _ in range(10000):
+            instrumentation_only()
+    before = sum(n for (e, s), n in _requests(metrics).items())
+    threads = [threading.Thread(target=hammer) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    after = sum(n for (e, s), n in _requests(metrics).items())
+    assert after - before == 80000, after - before
+    print(f"8 threads x 10000 requests recorded: {after - before} (no lost updates)")
+    print(f"render(): {time_per_call(metrics.render, 100) * 1e6:.0f} us per scrape")
+
+
+def _requests(metrics):
+    totals = {}
+    for shard in metrics._shards:
+        for key, n in shard.requests.items():
+            totals[key] = totals.get(key, 0) + n
+    return totals
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# File: benchmarks/bench_row_path.py
+# Per-request cost of the old DataFrame path vs the preallocated-row path
+# used by /predict.  Run: python benchmarks/bench_row_path.py
+
+from common import insurance_records, load_artifacts, time_per_call
+
+import numpy as np
+import pandas as pd
+
+from features import CONT_FEATURES, derive_features
+from inference import RowPredictor
+
+
+def feature_dict(rec):
+    raw = np.array([[float(v) for v in rec.values()]])
+    return {name: col[0].item() for name, col in derive_features(raw).items()}
+
+
+def main():
+    model, scaler = load_artifacts()
+    columns = list(model.feature_names_in_)
+    rows = [feature_dict(rec) for rec in insurance_records()]
+    fast = RowPredictor(model, scaler)
+
+    def legacy_frame(row):
+        df = pd.DataFrame([row])
+        df = df.reindex(columns=columns, fill_value=0)
+        df[CONT_FEATURES] = scaler.transform(df[CONT_FEATURES])
+        return df
+
+    # ---- Exactness: same model input and same prediction for every CSV row ----
+    for row in rows:
+        assert np.array_equal(legacy_frame(row).to_numpy(dtype=np.float64), fast.fill(row))
+    X = np.vstack([legacy_frame(row).to_numpy(dtype=np.float64) for row in rows[:50]])
+    assert np.array_equal(model.predict(X), [fast.predict(row) for row in rows[:50]])
+
+    row = rows[0]
+    prep_old = time_per_call(lambda: legacy_frame(row))
+    prep_new = time_per_call(lambda: fast.fill(row))
+    full_old = time_per_call(lambda: model.predict(legacy_frame(row)), repeat=20)
+    full_new = time_per_call(lambda: fast.predict(row), repeat=20)
+
+    print(f"{'stage':<28}{'DataFrame':>12}{'row':>12}{'saved':>12}")
+    print(f"{'featurize + scale (us)':<28}{prep_old * 1e6:>12.1f}{prep_new * 1e6:>12.1f}"
+          f"{(prep_old - prep_new) * 1e6:>12.1f}")
+    print(f"{'end-to-end predict (us)':<28}{full_old * 1e6:>12.1f}{full_new * 1e6:>12.1f}"
+          f"{(full_old - full_new) * 1e6:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
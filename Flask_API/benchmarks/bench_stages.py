@@ -0,0 +1,188 @@
+# File: benchmarks/bench_stages.py
+# Microbenchmarks of each inference stage on its own, at batch sizes 1 to 1M,
+# with a stored baseline and a comparison mode for regressions.
+#
+#   derive    features.derive_features on the (n, 10) raw inputs
+#   frame     pd.DataFrame(derived columns).reindex(model columns, fill_value=0)
+#   scale     scaler.transform(df[CONT_FEATURES])
+#   matrix    build_feature_matrix + scale_features (the NumPy path the API uses)
+#   predict   engine .predict on the scaled (n, 18) matrix (--engine, default sklearn)
+#
+# Each cell is timed as several samples (a sample is enough calls for ~10 ms),
+# so a comparison can test whether the new samples are really slower: a cell
+# is flagged when a one-sided Mann-Whitney U test gives p < --alpha AND the
+# median moved by more than --min-change.
+#
+# Run from Flask_API/:
+#   python benchmarks/bench_stages.py                 # print the table
+#   python benchmarks/bench_stages.py --save          # record the cells run into benchmarks/baselines/stages.json
+#   python benchmarks/bench_stages.py --compare       # exit status 1 on a regression
+#   python benchmarks/bench_stages.py --sizes 1 1000 --stages predict --engine flat --compare
+
+import argparse
+import json
+import os
+import platform
+import time
+
+from common import API_DIR, insurance_records, load_artifacts
+
+import numpy as np
+import pandas as pd
+import sklearn
+from scipy.stats import mannwhitneyu
+
+from features import CONT_FEATURES, REQUIRED_KEYS, build_feature_matrix, derive_features, scale_features
+from forest_engine import load_engine
+
+SIZES = (1, 10, 1000, 100000, 1000000)
+STAGES = ("derive", "frame", "scale", "matrix", "predict")
+BASELINE = os.path.join(API_DIR, "benchmarks", "baselines", "stages.json")
+
+
+def raw_inputs(n, seed=0):
+    """(n, 10) raw inputs sampled with replacement from insurance.csv."""
+    records = insurance_records()
+    table = np.array([[rec[k] for k in REQUIRED_KEYS] for rec in records], dtype=np.float64)
+    return table[np.random.default_rng(seed).integers(0, len(table), n)]
+
+
+def stage_calls(n, model, scaler, engine):
+    """{stage: zero-argument callable} over inputs prepared once for n rows."""
+    columns = list(model.feature_names_in_)
+    raw = raw_inputs(n)
+    derived = derive_features(raw)
+    frame = pd.DataFrame(derived).reindex(columns=columns, fill_value=0)
+    X = scale_features(build_feature_matrix(raw, columns), columns, scaler)
+    return {
+        "derive": lambda: derive_features(raw),
+        "frame": lambda: pd.DataFrame(derived).reindex(columns=columns, fill_value=0),
+        "scale": lambda: scaler.transform(frame[CONT_FEATURES]),
+        "matrix": lambda: scale_features(build_feature_matrix(raw, columns), columns, scaler),
+        "predict": lambda: engine.predict(X),
+    }
+
+
+def measure(fn, min_samples=5, max_samples=30, budget=2.0, sample_time=0.01):
+    """Seconds per call, one value per sample; the first (untimed) call warms up."""
+    start = time.perf_counter()
+    fn()
+    first = time.perf_counter() - start
+    number = max(1, int(sample_time / first)) if first > 0 else 1000
+    samples = []
+    deadline = time.perf_counter() + budget
+    while len(samples) < max_samples and (len(samples) < min_samples or time.perf_counter() < deadline):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) / number)
+    return samples
+
+
+def machine():
+    return {
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "scikit-learn": sklearn.__version__,
+    }
+
+
+def run(sizes, stages, engine_name):
+    model, scaler = load_artifacts()
+    engine = load_engine(model, engine_name, scaler)
+    if getattr(engine, "raw_input", False):
+        raise SystemExit("--engine folded expects unscaled input; time it with forest_engine.py")
+    results = {}
+    print(f"{'stage':<20}{'rows':>9}{'median':>14}{'per row':>14}{'samples':>9}")
+    for n in sizes:
+        calls = stage_calls(n, model, scaler, engine)
+        for stage in stages:
+            key = stage if stage != "predict" else f"predict[{engine_name}]"
+            samples = measure(calls[stage])
+            results.setdefault(key, {})[str(n)] = [float(f"{s:.6g}") for s in samples]
+            median = float(np.median(samples))
+            print(f"{key:<20}{n:>9}{_fmt(median):>14}{_fmt(median / n):>14}{len(samples):>9}")
+    return results
+
+
+def compare(results, baseline, alpha, min_change):
+    """Print new vs baseline medians; returns the number of regressions."""
+    if baseline["machine"] != machine():
+        print("note: the baseline was recorded on a different machine/software stack:")
+        print("      " + json.dumps(baseline["machine"]))
+    regressions = 0
+    print(f"\n{'stage':<20}{'rows':>9}{'baseline':>14}{'now':>14}{'ratio':>8}{'p':>9}")
+    for key, cells in results.items():
+        for n, samples in cells.items():
+            base = baseline["results"].get(key, {}).get(n)
+            if not base:
+                print(f"{key:<20}{n:>9}{'-':>14}{_fmt(np.median(samples)):>14}   (no baseline)")
+                continue
+            ratio = float(np.median(samples) / np.median(base))
+            slower = mannwhitneyu(samples, base, alternative="greater").pvalue
+            faster = mannwhitneyu(samples, base, alternative="less").pvalue
+            verdict = ""
+            if slower < alpha and ratio > 1 + min_change:
+                verdict = "REGRESSION"
+                regressions += 1
+            elif faster < alpha and ratio < 1 - min_change:
+                verdict = "faster"
+            p = min(slower, faster)
+            print(f"{key:<20}{n:>9}{_fmt(np.median(base)):>14}{_fmt(np.median(samples)):>14}"
+                  f"{ratio:>8.2f}{p:>9.4f}  {verdict}")
+    return regressions
+
+
+def _fmt(seconds):
+    for unit, scale in (("s", 1.0), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3f} {unit}"
+    return f"{seconds * 1e9:.1f} ns"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-stage inference microbenchmarks with a stored baseline")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES))
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--engine", default="sklearn", help="engine timed by the predict stage (flat, sklearn)")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save", action="store_true", help="merge these results into the baseline file")
+    parser.add_argument("--compare", action="store_true", help="compare with the baseline; exit 1 on a regression")
+    parser.add_argument("--alpha", type=float, default=0.01, help="significance level of the comparison")
+    parser.add_argument("--min-change", type=float, default=0.10,
+                        help="ignore significant changes of the median smaller than this fraction "
+                             "(run-to-run drift on a shared machine is often 5-10%%)")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.stages, args.engine)
+
+    if args.compare:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.alpha, args.min_change)
+        print(f"\n{regressions} regression(s) at p < {args.alpha} and > {args.min_change:.0%} slower")
+        if regressions:
+            raise SystemExit(1)
+
+    if args.save:
+        baseline = {"results": {}}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        for key, cells in results.items():  # only the cells that were run are replaced
+            baseline["results"].setdefault(key, {}).update(cells)
+        baseline["machine"] = machine()
+        baseline["recorded"] = time.strftime("%Y-%m-%d")
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=1, sort_keys=True)
+            f.write("\n")
+        print(f"baseline written to {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
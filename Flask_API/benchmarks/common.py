@@ -0,0 +1,45 @@
+# File: benchmarks/common.py
+# Shared setup for the benchmark scripts: artifact loading and sample
+# applicants from the training CSV.
+
+import os
+import sys
+import time
+import warnings
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, API_DIR)
+
+import joblib  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from features import REQUIRED_KEYS  # noqa: E402
+
+DATA_CSV = os.path.join(API_DIR, "..", "Jupyter Notebooks", "Question & Data", "insurance.csv")
+
+warnings.filterwarnings("ignore", message="X does not have valid feature names", category=UserWarning)
+
+
+def load_artifacts():
+    model = joblib.load(os.path.join(API_DIR, "best_model.pkl"))
+    scaler = joblib.load(os.path.join(API_DIR, "scaler.pkl"))
+    return model, scaler
+
+
+def insurance_records():
+    """Rows of insurance.csv as API payloads (REQUIRED_KEYS, in file order)."""
+    df = pd.read_csv(DATA_CSV)
+    df = df.iloc[:, :len(REQUIRED_KEYS)]
+    df.columns = REQUIRED_KEYS
+    return [{k: int(v) for k, v in rec.items()} for rec in df.to_dict("records")]
+
+
+def time_per_call(fn, repeat=200):
+    """Best-of-5 mean seconds per call of fn()."""
+    best = float("inf")
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        best = min(best, (time.perf_counter() - start) / repeat)
+    return best
@@ -0,0 +1,58 @@
+# File: benchmarks/http_client.py
+# Minimal asyncio HTTP/1.1 client for load benchmarks: persistent keep-alive
+# connections, reconnecting when the server answers "Connection: close"
+# (gunicorn sync workers do).  No third-party dependencies.
+
+import asyncio
+import time
+
+
+class HttpConnection:
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def _connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except OSError:
+                pass
+            self.writer = None
+
+    async def request(self, method, path, body=b"", content_type="application/json"):
+        """-> (status, response body, seconds).  Raises OSError on connection failure."""
+        if self.writer is None:
+            await self._connect()
+        head = (f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+                f"Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\n"
+                f"Connection: keep-alive\r\n\r\n").encode()
+        start = time.perf_counter()
+        self.writer.write(head + body)
+        await self.writer.drain()
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionResetError("server closed the connection")
+        status = int(status_line.split()[1])
+        length, close = 0, False
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            name = name.strip().lower()
+            if name == "content-length":
+                length = int(value)
+            elif name == "connection" and value.strip().lower() == "close":
+                close = True
+        payload = await self.reader.readexactly(length)
+        elapsed = time.perf_counter() - start
+        if close:
+            await self.close()
+        return status, payload, elapsed
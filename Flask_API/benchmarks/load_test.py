@@ -0,0 +1,281 @@
+# File: benchmarks/load_test.py
+# Load generator for sizing deployments: replays applicants drawn from
+# insurance.csv against /predict (or /predict_batch) and prints one JSON
+# report - throughput, p50/p95/p99/p99.9 latency, error rate - that can be
+# diffed between commits and worker configurations.
+#
+# Targets (no external services needed):
+#   --target test-client   the Flask app in this process (app code only, no network)
+#   --target gunicorn      the PROCFILE command, started on a free local port
+#   --target URL           an already running server, e.g. http://127.0.0.1:8000
+# Modes:
+#   --mode closed --concurrency N   N clients, each sends its next request when the last one returns
+#   --mode open --rate R            R requests/s on a fixed schedule, whatever the latency; latency
+#                                   is measured from the scheduled send time, so a stalled server
+#                                   shows up in the tail instead of silently slowing the load
+# Run from Flask_API/:
+#   python benchmarks/load_test.py --target gunicorn --workers 2 --mode open --rate 500 -o run.json
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shlex
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from common import API_DIR, insurance_records
+
+import numpy as np
+
+from http_client import HttpConnection
+
+
+# ---- Targets: async request(body) -> status ----
+class TestClientTarget:
+    """The Flask app in-process; requests run on a thread pool (one test client per thread)."""
+
+    def __init__(self, path, threads):
+        import flask_app
+        self.app = flask_app.app
+        self.path = path
+        self.executor = ThreadPoolExecutor(max_workers=threads)
+        self._local = threading.local()
+
+    def _post(self, body):
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        return client.post(self.path, data=body, content_type="application/json").status_code
+
+    async def request(self, body):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self._post, body)
+
+    async def close(self):
+        self.executor.shutdown(wait=True)
+
+
+class HttpTarget:
+    """A server over HTTP/1.1 keep-alive connections, reused from an idle pool."""
+
+    def __init__(self, url, path):
+        parts = urllib.parse.urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.path = path
+        self._idle = []
+        self.connections = 0  # opened so far
+
+    async def request(self, body):
+        if self._idle:
+            conn = self._idle.pop()
+        else:
+            conn = HttpConnection(self.host, self.port)
+            self.connections += 1
+        try:
+            status, _, _ = await conn.request("POST", self.path, body)
+        except BaseException:
+            await conn.close()
+            raise
+        self._idle.append(conn)
+        return status
+
+    async def close(self):
+        for conn in self._idle:
+            await conn.close()
+
+
+def start_gunicorn(workers):
+    """Start the PROCFILE web command on a free port; -> (process, url)."""
+    with open(os.path.join(API_DIR, "PROCFILE")) as f:
+        web = next(line for line in f if line.startswith("web:"))
+    cmd = shlex.split(web[len("web:"):])
+    if cmd[0] == "gunicorn":
+        cmd = [sys.executable, "-m", "gunicorn"] + cmd[1:]
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    # gunicorn binds to $PORT and runs $WEB_CONCURRENCY workers when the command does not say otherwise
+    env = dict(os.environ, PORT=str(port), LOG_LEVEL=os.environ.get("LOG_LEVEL", "WARNING"))
+    if workers:
+        env["WEB_CONCURRENCY"] = str(workers)
+    proc = subprocess.Popen(cmd, cwd=API_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"gunicorn exited with status {proc.returncode}")
+        try:
+            urllib.request.urlopen(url + "/health", timeout=5).read()
+            return proc, url
+        except OSError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise SystemExit("gunicorn did not come up")
+
+
+# ---- Load ----
+class Recorder:
+    def __init__(self):
+        self.latencies = []  # seconds, successful requests only
+        self.errors = {}  # status code or exception name -> n
+
+    async def send(self, target, body, start):
+        try:
+            status = await target.request(body)
+        except (OSError, asyncio.IncompleteReadError, ValueError, IndexError) as e:
+            status = type(e).__name__
+        if status == 200:
+            self.latencies.append(time.perf_counter() - start)
+        else:
+            self.errors[str(status)] = self.errors.get(str(status), 0) + 1
+
+
+async def closed_loop(target, bodies, concurrency, duration, recorder):
+    stop_at = time.perf_counter() + duration
+    sent = 0
+
+    async def client():
+        nonlocal sent
+        while time.perf_counter() < stop_at:
+            body = bodies[sent % len(bodies)]
+            sent += 1
+            await recorder.send(target, body, time.perf_counter())
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+
+
+async def open_loop(target, bodies, rate, duration, recorder, max_in_flight):
+    """Send request i at start + i / rate.  Arrivals that find max_in_flight
+    requests outstanding are counted as "dropped" errors instead of queued."""
+    start = time.perf_counter()
+    in_flight = set()
+    for i in range(int(rate * duration)):
+        scheduled = start + i / rate
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if len(in_flight) >= max_in_flight:
+            recorder.errors["dropped"] = recorder.errors.get("dropped", 0) + 1
+            continue
+        task = asyncio.ensure_future(recorder.send(target, bodies[i % len(bodies)], scheduled))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+    if in_flight:
+        await asyncio.gather(*in_flight)
+
+
+def payloads(batch_size, seed, n=10000):
+    """n request bodies of applicants sampled (with replacement) from insurance.csv."""
+    records = insurance_records()
+    rng = random.Random(seed)
+    if batch_size == 1:
+        return [json.dumps(rng.choice(records)).encode() for _ in range(n)]
+    return [json.dumps(rng.choices(records, k=batch_size)).encode() for _ in range(max(1, n // batch_size))]
+
+
+def report(recorder, wall, args, target_name):
+    lat = np.sort(np.asarray(recorder.latencies)) * 1000.0
+    ok, failed = len(lat), sum(recorder.errors.values())
+    total = ok + failed
+    percentiles = np.percentile(lat, [50, 95, 99, 99.9]).tolist() if ok else [None] * 4
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=API_DIR,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "target": target_name,
+        "mode": args.mode,
+        "rate": args.rate if args.mode == "open" else None,
+        "concurrency": args.concurrency if args.mode == "closed" else None,
+        "endpoint": "/predict" if args.batch_size == 1 else "/predict_batch",
+        "batch_size": args.batch_size,
+        "workers": args.workers if args.target == "gunicorn" else None,
+        "duration_s": round(wall, 3),
+        "requests": total,
+        "ok": ok,
+        "error_rate": failed / total if total else 0.0,
+        "errors": recorder.errors,
+        "throughput_rps": ok / wall,
+        "rows_per_s": ok * args.batch_size / wall,
+        "latency_ms": {
+            "p50": percentiles[0],
+            "p95": percentiles[1],
+            "p99": percentiles[2],
+            "p99.9": percentiles[3],
+            "mean": float(lat.mean()) if ok else None,
+            "max": float(lat[-1]) if ok else None
+        },
+        "seed": args.seed,
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z")
+    }
+
+
+async def run(target, bodies, args):
+    async def load(duration, recorder):
+        if args.mode == "closed":
+            await closed_loop(target, bodies, args.concurrency, duration, recorder)
+        else:
+            await open_loop(target, bodies, args.rate, duration, recorder, args.max_in_flight)
+
+    if args.warmup > 0:
+        await load(args.warmup, Recorder())
+    recorder = Recorder()
+    start = time.perf_counter()
+    await load(args.duration, recorder)
+    wall = time.perf_counter() - start
+    await target.close()
+    return recorder, wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay insurance.csv applicants against the API")
+    parser.add_argument("--target", default="test-client", help="test-client, gunicorn, or a base URL")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="gunicorn workers (default: $WEB_CONCURRENCY or gunicorn's default)")
+    parser.add_argument("--mode", choices=("closed", "open"), default="closed")
+    parser.add_argument("--concurrency", type=int, default=16, help="clients in closed-loop mode")
+    parser.add_argument("--rate", type=float, default=200.0, help="requests/s in open-loop mode")
+    parser.add_argument("--max-in-flight", type=int, default=1024,
+                        help="open loop: outstanding requests before new arrivals are dropped")
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=2.0, help="unrecorded seconds before measuring")
+    parser.add_argument("--batch-size", type=int, default=1, help="rows per request; >1 uses /predict_batch")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the sampled applicants")
+    parser.add_argument("-o", "--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    bodies = payloads(args.batch_size, args.seed)
+    path = "/predict" if args.batch_size == 1 else "/predict_batch"
+    proc = None
+    if args.target == "test-client":
+        threads = args.concurrency if args.mode == "closed" else min(args.max_in_flight, 64)
+        target = TestClientTarget(path, threads)
+    elif args.target == "gunicorn":
+        proc, url = start_gunicorn(args.workers)
+        target = HttpTarget(url, path)
+    else:
+        target = HttpTarget(args.target, path)
+    try:
+        recorder, wall = asyncio.run(run(target, bodies, args))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+    result = json.dumps(report(recorder, wall, args, args.target), indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(result + "\n")
+    print(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+# File: benchmarks/measure_worker_memory.py
+# Per-worker memory of the gunicorn deployment with and without preloading.
+#
+# Starts `gunicorn -c gunicorn.conf.py flask_app:app` twice (GUNICORN_PRELOAD=0
+# and =1), warms every worker with /predict calls, then reads
+# /proc/<pid>/smaps_rollup for each worker:
+#   USS = Private_Clean + Private_Dirty  (memory only this worker holds)
+#   PSS = proportional share, RSS = resident incl. shared pages
+# Linux only.  Run from Flask_API/:  python benchmarks/measure_worker_memory.py --workers 4
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PAYLOAD = {
+    "Age": 45, "Diabetes": 0, "Blood_Pressure_Problems": 0, "Any_Transplants": 0,
+    "Any_Chronic_Diseases": 0, "Height": 155, "Weight": 57, "Known_Allergies": 0,
+    "History_of_Cancer_in_Family": 0, "Number_of_Major_Surgeries": 0
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def smaps_rollup(pid):
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                fields[parts[0][:-1]] = int(parts[1])  # kB
+    return {
+        "uss_mb": (fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)) / 1024,
+        "pss_mb": fields.get("Pss", 0) / 1024,
+        "rss_mb": fields.get("Rss", 0) / 1024
+    }
+
+
+def children(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(p) for p in f.read().split()]
+
+
+def post(url):
+    req = urllib.request.Request(url, data=json.dumps(PAYLOAD).encode(),
+                                 headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req, timeout=30) as resp:
+        resp.read()
+
+
+def measure(preload, workers, warmup):
+    port = free_port()
+    env = dict(os.environ, GUNICORN_PRELOAD="1" if preload else "0", PREDICTION_CACHE_SIZE="0")
+    cmd = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "-w", str(workers),
+           "-b", f"127.0.0.1:{port}", "flask_app:app"]
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=API_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        # ready once every worker has booted and answers
+        deadline = time.time() + 120
+        while time.time() < deadline:
+            try:
+                if len(children(proc.pid)) == workers:
+                    urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=5).read()
+                    break
+            except OSError:
+                pass
+            time.sleep(0.2)
+        else:
+            raise SystemExit("gunicorn did not come up")
+        boot = time.perf_counter() - start
+        for _ in range(warmup * workers):  # spread over workers by the accept loop
+            post(f"http://127.0.0.1:{port}/predict")
+        time.sleep(1.0)
+        stats = [smaps_rollup(pid) for pid in children(proc.pid)]
+        master = smaps_rollup(proc.pid)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+    return boot, master, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-worker memory with/without gunicorn preload")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--warmup", type=int, default=20, help="/predict calls per worker before measuring")
+    args = parser.parse_args()
+
+    results = {}
+    for preload in (False, True):
+        boot, master, stats = measure(preload, args.workers, args.warmup)
+        label = "preload" if preload else "no preload"
+        n = len(stats)
+        uss = sum(s["uss_mb"] for s in stats) / n
+        pss = sum(s["pss_mb"] for s in stats) / n
+        rss = sum(s["rss_mb"] for s in stats) / n
+        results[label] = uss
+        print(f"{label:<11} workers={n} boot={boot:5.1f}s  per-worker USS={uss:7.1f} MB  "
+              f"PSS={pss:7.1f} MB  RSS={rss:7.1f} MB  master RSS={master['rss_mb']:7.1f} MB")
+    saved = results["no preload"] - results["preload"]
+    print(f"unique memory saved per worker: {saved:.1f} MB "
+          f"({saved * args.workers:.1f} MB across {args.workers} workers)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# File: binary_codec.py
+# Fixed-layout binary encoding for /predict and /predict_batch.
+#
+# A record is the ten inputs in REQUIRED_KEYS order, little-endian, packed:
+#   Age uint16 | 4 x flag uint8 | Height float64 | Weight float64 |
+#   Known_Allergies, History_of_Cancer_in_Family, Number_of_Major_Surgeries uint8
+# = 25 bytes.  A batch is records back to back.  A response is one float64
+# per record (NaN for a batch row that could not be scored).
+#
+# Height/Weight stay float64 so a binary request predicts exactly what the same
+# JSON request does.  JSON stays the default; the binary path is chosen by the
+# request Content-Type and (for the response) the Accept header.
+
+import struct
+
+import numpy as np
+
+from features import REQUIRED_KEYS
+
+RECORD_TYPE = "application/x-insurance-record"  # request body
+PREMIUM_TYPE = "application/x-insurance-premium"  # response body
+
+RECORD = struct.Struct("<H4Bdd3B")
+PREMIUM = struct.Struct("<d")
+
+RECORD_DTYPE = np.dtype([
+    ("Age", "<u2"),
+    ("Diabetes", "u1"),
+    ("Blood_Pressure_Problems", "u1"),
+    ("Any_Transplants", "u1"),
+    ("Any_Chronic_Diseases", "u1"),
+    ("Height", "<f8"),
+    ("Weight", "<f8"),
+    ("Known_Allergies", "u1"),
+    ("History_of_Cancer_in_Family", "u1"),
+    ("Number_of_Major_Surgeries", "u1")
+])
+assert RECORD_DTYPE.itemsize == RECORD.size and list(RECORD_DTYPE.names) == REQUIRED_KEYS
+
+
+def encode_record(values):
+    """Pack one applicant given as a dict (API keys) or a sequence in REQUIRED_KEYS order."""
+    if isinstance(values, dict):
+        values = [values[k] for k in REQUIRED_KEYS]
+    return RECORD.pack(*(float(v) if k in ("Height", "Weight") else int(v)
+                         for k, v in zip(REQUIRED_KEYS, values)))
+
+
+def decode_record(body):
+    """One record -> {key: value}.  Raises ValueError on a wrong-sized body."""
+    if len(body) != RECORD.size:
+        raise ValueError(f"Binary record must be {RECORD.size} bytes, got {len(body)}")
+    return dict(zip(REQUIRED_KEYS, RECORD.unpack(body)))
+
+
+def encode_records(rows):
+    """Pack a batch of applicants (dicts or sequences)."""
+    return b"".join(encode_record(row) for row in rows)
+
+
+def decode_records(body):
+    """A batch body -> {key: column} views over the buffer (no parsing, no copy)."""
+    if len(body) % RECORD.size:
+        raise ValueError(f"Binary batch length {len(body)} is not a multiple of {RECORD.size}")
+    records = np.frombuffer(body, dtype=RECORD_DTYPE)
+    return {key: records[key] for key in REQUIRED_KEYS}, len(records)
+
+
+def encode_premiums(predictions):
+    """float64 little-endian array of predictions (NaN marks a failed row)."""
+    return np.asarray(predictions, dtype="<f8").tobytes()
+
+
+def decode_premiums(body):
+    return np.frombuffer(body, dtype="<f8")
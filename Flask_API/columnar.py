@@ -0,0 +1,136 @@
+# File: columnar.py
+# Arrow IPC / Parquet input and output for batch scoring.
+#
+# Record batches are scored column-wise: the ten input columns are handed to
+# the featurizer as NumPy views of the Arrow buffers (zero-copy for null-free
+# int/float columns), and the result is the input batch with "prediction" and
+# "error" columns appended - the input columns themselves are never rewritten.
+# pyarrow is optional; only these paths need it.
+
+import numpy as np
+
+from features import FLOAT_KEYS, REQUIRED_KEYS
+from validation import invalid_rows
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.ipc as ipc
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - depends on the deployment
+    pa = None
+
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+PARQUET_SUFFIXES = (".parquet", ".pq")
+ARROW_SUFFIXES = (".arrow", ".feather", ".ipc")
+
+
+def require_pyarrow():
+    if pa is None:
+        raise RuntimeError("Arrow/Parquet support needs pyarrow (pip install pyarrow)")
+
+
+def is_columnar(path):
+    return path.lower().endswith(PARQUET_SUFFIXES + ARROW_SUFFIXES)
+
+
+# ---- Arrow column -> NumPy ----
+def column_values(array):
+    """(values, missing): a 1-D NumPy array for an Arrow column, plus a mask of
+    null / non-numeric cells (None when there are none).
+
+    Null-free integer and floating columns come back as zero-copy views.
+    """
+    if array.null_count == 0 and (pa.types.is_integer(array.type) or pa.types.is_floating(array.type)):
+        return array.to_numpy(zero_copy_only=True), None
+    try:
+        values = pc.cast(array, pa.float64()).to_numpy(zero_copy_only=False)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):  # e.g. strings that are not all numbers
+        import pandas as pd
+        values = pd.to_numeric(array.to_pandas(), errors="coerce").to_numpy(np.float64)
+    missing = np.isnan(values)
+    return values, (missing if missing.any() else None)
+
+
+def feature_columns(batch, schema=None):
+    """{key: column} for the ten inputs of a record batch plus {row: error}.
+
+    `schema` maps API key -> batch column name (default: the keys themselves).
+    Int keys stored as floats are truncated like the API's int().
+    """
+    schema = schema or {key: key for key in REQUIRED_KEYS}
+    cols, errors = {}, {}
+    for key in REQUIRED_KEYS:
+        array = batch.column(schema[key])
+        values, missing = column_values(array)
+        if missing is not None:
+            nulls = array.is_null().to_numpy(zero_copy_only=False)
+            for i in np.flatnonzero(missing):
+                errors.setdefault(int(i), f"{key}: missing value" if nulls[i]
+                                  else f"{key}: could not convert {array[int(i)].as_py()!r} to a number")
+        if key not in FLOAT_KEYS and values.dtype.kind == "f":
+            values = np.trunc(values)
+        cols[key] = values
+    for i, msg in invalid_rows(cols):
+        errors.setdefault(i, msg)
+    return cols, errors
+
+
+def with_predictions(batch, predictions, valid, errors, extra=None):
+    """The input batch plus "prediction" (null for failed rows), any `extra`
+    float64 columns ({name: values}, placed before "error") and "error"."""
+    failed = ~np.asarray(valid, dtype=bool)
+    extra = extra or {}
+    floats = [pa.array(values, type=pa.float64(), mask=failed) for values in [predictions, *extra.values()]]
+    error = pa.array([errors.get(i) for i in range(batch.num_rows)], type=pa.string())
+    return pa.RecordBatch.from_arrays(
+        batch.columns + floats + [error],
+        names=batch.schema.names + ["prediction", *extra, "error"]
+    )
+
+
+# ---- Files and streams ----
+def read_batches(path, batch_rows=65536):
+    """Record batches of a Parquet or Arrow IPC (file or stream format) file."""
+    require_pyarrow()
+    if path.lower().endswith(PARQUET_SUFFIXES):
+        yield from pq.ParquetFile(path).iter_batches(batch_size=batch_rows)
+        return
+    source = pa.memory_map(path)  # IPC buffers are read straight from the mapping
+    try:
+        reader = ipc.open_file(source)
+        batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+    except pa.ArrowInvalid:
+        source.seek(0)
+        batches = ipc.open_stream(source)
+    for batch in batches:
+        for offset in range(0, batch.num_rows, batch_rows):
+            yield batch.slice(offset, batch_rows)  # zero-copy
+
+
+def open_writer(path, schema):
+    """Parquet or Arrow IPC file writer (by extension) with .write_batch / .close."""
+    require_pyarrow()
+    if path.lower().endswith(PARQUET_SUFFIXES):
+        return pq.ParquetWriter(path, schema)
+    return ipc.new_file(path, schema)
+
+
+def output_schema(schema, extra_names=()):
+    for name in ["prediction", *extra_names]:
+        schema = schema.append(pa.field(name, pa.float64()))
+    return schema.append(pa.field("error", pa.string()))
+
+
+def read_stream(body):
+    """Record batches of an Arrow IPC stream held in memory (zero-copy)."""
+    require_pyarrow()
+    return list(ipc.open_stream(pa.py_buffer(body)))
+
+
+def write_stream(batches, schema):
+    sink = pa.BufferOutputStream()
+    with ipc.new_stream(sink, schema) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
@@ -0,0 +1,276 @@
+# File: compact_model.py
+# Compact, inference-only export of best_model.pkl.
+#
+# The sklearn pickle keeps float64 node arrays plus training-only fields
+# (impurity, n_node_samples, weighted_n_node_samples, per-node values of
+# internal nodes).  Scoring needs, per node, the split feature, the threshold
+# and the children, and for leaves the value.  This export keeps only that,
+# each in the narrowest dtype that leaves every prediction unchanged, with all
+# trees packed into one contiguous buffer:
+#
+#   feature    uint per node; n_features (one past the last column) marks a leaf
+#   threshold  per node, rounded *down* to the narrowest float that keeps the
+#              split exact: sklearn tests float32(x) <= t, and for float32 x
+#              that is the same test as x <= (largest float32 <= t), so
+#              float32 always works and float16 is used when it does too
+#   payload    uint per node: internal -> right child relative to the tree's
+#              root (the left child is always node + 1 in sklearn's
+#              depth-first layout); leaf -> index into `values`
+#   values     the distinct leaf values, in the narrowest float holding them exactly
+#   roots      first node of each tree
+#
+# File layout: MAGIC, uint32 header length, JSON header (columns, dtypes,
+# section offsets, digest of best_model.pkl), then the sections, each 8-byte
+# aligned.  Loading is np.frombuffer over the sections plus a vectorized
+# expansion into a FlatForest.
+#
+#   python compact_model.py                   -> compact_model.bin + size/load-time/deviation report
+#   python compact_model.py --report report.json
+
+import argparse
+import json
+import os
+import pickle
+import struct
+import time
+import warnings
+
+import joblib
+import numpy as np
+
+from artifacts import MODEL_PATH, artifact_digest
+from forest_engine import FlatForest
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_CSV = os.path.join(BASE_DIR, "..", "Jupyter Notebooks", "Question & Data", "insurance.csv")
+COMPACT_PATH = os.path.join(BASE_DIR, "compact_model.bin")
+MAGIC = b"RFCOMPACT1"
+ALIGN = 8
+
+warnings.filterwarnings("ignore", message="X does not have valid feature names", category=UserWarning)
+
+
+# ---- Narrowest exact dtypes ----
+def _uint(max_value):
+    return np.min_scalar_type(max(int(max_value), 0))
+
+
+def _narrowest_values(values):
+    """Narrowest float dtype that represents every value exactly."""
+    for dtype in (np.float16, np.float32):
+        with np.errstate(over="ignore"):
+            if np.array_equal(values.astype(dtype).astype(np.float64), values):
+                return values.astype(dtype)
+    return values.astype(np.float64)
+
+
+def _narrowest_thresholds(t):
+    """t rounded down to the narrowest float dtype c for which, for every
+    float32 x, x <= t  <=>  x <= c (no float32 lies in (c, t])."""
+    for dtype in (np.float16, np.float32):
+        with np.errstate(over="ignore"):
+            c = t.astype(dtype)
+            c = np.where(c.astype(np.float64) > t, np.nextafter(c, dtype(-np.inf)), c).astype(dtype)
+            above = np.nextafter(c.astype(np.float32), np.float32(np.inf)).astype(np.float64)
+        if np.all(np.isfinite(c)) and np.all(above > t):
+            return c
+    raise ValueError("thresholds do not fit float32 exactly")  # cannot happen for sklearn trees
+
+
+# ---- Export ----
+def compact_arrays(model):
+    """{section: array} for a fitted RandomForestRegressor (single output)."""
+    feature, threshold, right, leaf_values, roots = [], [], [], [], []
+    offset = 0
+    for est in model.estimators_:
+        tree = est.tree_
+        is_leaf = tree.children_left == -1
+        internal = np.flatnonzero(~is_leaf)
+        if not np.array_equal(tree.children_left[internal], internal + 1):
+            raise ValueError("tree is not in depth-first order (left child != node + 1)")
+        feature.append(np.where(is_leaf, -1, tree.feature))
+        threshold.append(np.where(is_leaf, 0.0, tree.threshold))
+        right.append(np.where(is_leaf, -1, tree.children_right))
+        leaf_values.append(np.where(is_leaf, tree.value[:, 0, 0], np.nan))
+        roots.append(offset)
+        offset += tree.node_count
+    feature, threshold = np.concatenate(feature), np.concatenate(threshold)
+    right, leaf_values = np.concatenate(right), np.concatenate(leaf_values)
+    is_leaf = feature == -1
+
+    values, value_index = np.unique(leaf_values[is_leaf], return_inverse=True)
+    payload = right.copy()
+    payload[is_leaf] = value_index
+    leaf_code = model.n_features_in_  # first id that is not a feature
+    feature[is_leaf] = leaf_code
+    return {
+        "feature": feature.astype(_uint(leaf_code)),
+        "threshold": _narrowest_thresholds(threshold),
+        "payload": payload.astype(_uint(payload.max())),
+        "values": _narrowest_values(values),
+        "roots": np.asarray(roots).astype(_uint(offset)),
+    }
+
+
+def pack(model, digest=None):
+    """The compact artifact of `model` as bytes."""
+    arrays = compact_arrays(model)
+    sections, chunks, offset = {}, [], 0
+    for name, array in arrays.items():
+        data = np.ascontiguousarray(array).tobytes()
+        sections[name] = {"dtype": array.dtype.str, "offset": offset, "count": len(array)}
+        pad = -len(data) % ALIGN
+        chunks.append(data + b"\0" * pad)
+        offset += len(data) + pad
+    header = json.dumps({
+        "columns": [str(c) for c in model.feature_names_in_],
+        "n_estimators": len(model.estimators_),
+        "max_depth": max(est.tree_.max_depth for est in model.estimators_),
+        "leaf": int(model.n_features_in_),
+        "digest": digest,
+        "sections": sections,
+    }).encode()
+    head = MAGIC + struct.pack("<I", len(header)) + header
+    head += b"\0" * (-len(head) % ALIGN)
+    return head + b"".join(chunks)
+
+
+# ---- Load ----
+def unpack(buffer):
+    """(header, {section: array view into buffer})."""
+    if bytes(buffer[:len(MAGIC)]) != MAGIC:
+        raise ValueError("not a compact model artifact")
+    (size,) = struct.unpack_from("<I", buffer, len(MAGIC))
+    start = len(MAGIC) + 4
+    header = json.loads(bytes(buffer[start:start + size]))
+    base = start + size + (-(start + size) % ALIGN)
+    arrays = {name: np.frombuffer(buffer, dtype=s["dtype"], count=s["count"], offset=base + s["offset"])
+              for name, s in header["sections"].items()}
+    return header, arrays
+
+
+def to_forest(header, arrays, **kwargs):
+    """Expand the compact sections into a FlatForest (same predictions as the model)."""
+    feature, payload, roots = arrays["feature"], arrays["payload"].astype(np.intp), arrays["roots"].astype(np.intp)
+    n = len(feature)
+    own = np.arange(n)
+    is_leaf = feature == header["leaf"]
+    root_of = np.repeat(roots, np.diff(np.append(roots, n)))
+    return FlatForest(
+        feature=np.where(is_leaf, 0, feature).astype(np.intp),
+        threshold=np.where(is_leaf, np.inf, arrays["threshold"].astype(np.float64)),
+        left=np.where(is_leaf, own, own + 1),
+        right=np.where(is_leaf, own, root_of + payload),
+        value=np.where(is_leaf, arrays["values"].astype(np.float64)[np.where(is_leaf, payload, 0)], 0.0),
+        roots=roots,
+        max_depth=header["max_depth"],
+        feature_names_in_=header["columns"],
+        **kwargs
+    )
+
+
+def load_compact(path=COMPACT_PATH, app_logger=None, **kwargs):
+    """FlatForest from a compact artifact, or None if it is missing or was
+    exported from a different best_model.pkl."""
+    if not os.path.exists(path):
+        if app_logger is not None:
+            app_logger.warning("Compact model %s not found; run python compact_model.py", path)
+        return None
+    with open(path, "rb") as f:
+        header, arrays = unpack(f.read())
+    if header["digest"] != artifact_digest(MODEL_PATH):
+        if app_logger is not None:
+            app_logger.warning("Compact model %s is stale (best_model.pkl changed); ignoring it", path)
+        return None
+    return to_forest(header, arrays, **kwargs)
+
+
+def split_probes(forest, X, n, seed=0):
+    """Rows of X with one feature set exactly on a (rounded) split threshold
+    or the next float32 above it - where a wrong rounding would flip a branch."""
+    rng = np.random.default_rng(seed)
+    internal = np.flatnonzero(forest.left != np.arange(forest.node_count))
+    nodes = rng.choice(internal, n)
+    rows = X[rng.integers(0, len(X), n)].copy()
+    values = forest.threshold[nodes].astype(np.float32)
+    values = np.where(rng.integers(0, 2, n) == 1, np.nextafter(values, np.float32(np.inf)), values)
+    rows[np.arange(n), forest.feature[nodes]] = values
+    return rows
+
+
+def _best_time(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    from compile_model import random_applicants
+    from features import REQUIRED_KEYS, build_feature_matrix, scale_features
+
+    parser = argparse.ArgumentParser(description="Export and verify the compact model artifact")
+    parser.add_argument("--out", default=COMPACT_PATH)
+    parser.add_argument("--random", type=int, default=50000, help="random applicants to verify on")
+    parser.add_argument("--report", help="also write the report as JSON here")
+    args = parser.parse_args()
+
+    model = joblib.load(MODEL_PATH)
+    scaler = joblib.load(os.path.join(BASE_DIR, "scaler.pkl"))
+    model.set_params(n_jobs=1)  # estimator-order summation, as in FlatForest
+    columns = list(model.feature_names_in_)
+
+    blob = pack(model, artifact_digest(MODEL_PATH))
+    header, arrays = unpack(blob)
+    forest = to_forest(header, arrays)
+
+    # ---- Verify: predictions must not move ----
+    train = np.loadtxt(DATA_CSV, delimiter=",", skiprows=1, usecols=range(len(REQUIRED_KEYS)))
+    X_random = scale_features(build_feature_matrix(random_applicants(args.random), columns), columns, scaler)
+    checks = [
+        ("insurance.csv", scale_features(build_feature_matrix(train, columns), columns, scaler)),
+        ("random", X_random),
+        ("split probes", split_probes(forest, X_random, args.random)),
+    ]
+    deviation = {}
+    for label, X in checks:
+        diff = np.abs(forest.predict(X) - model.predict(X))
+        deviation[label] = {"rows": len(X), "max_abs_deviation": float(diff.max()),
+                            "mismatches": int(np.count_nonzero(diff))}
+        print(f"{label:<14} rows={len(X):<7} max |compact - model| = {diff.max():.3g}  "
+              f"mismatches={deviation[label]['mismatches']}")
+    if any(d["mismatches"] for d in deviation.values()):
+        raise SystemExit("Compact model changes predictions; not saving")
+
+    with open(args.out, "wb") as f:
+        f.write(blob)
+
+    # ---- Report: size and load time ----
+    report = {
+        "pickle_file_bytes": os.path.getsize(MODEL_PATH),
+        "pickle_bytes": len(pickle.dumps(model)),
+        "compact_bytes": len(blob),
+        "sections": {name: {"dtype": a.dtype.name, "count": len(a), "bytes": a.nbytes}
+                     for name, a in arrays.items()},
+        "load_seconds": {"joblib.load(best_model.pkl)": _best_time(lambda: joblib.load(MODEL_PATH)),
+                         "load_compact": _best_time(lambda: load_compact(args.out))},
+        "deviation": deviation,
+    }
+    report["size_reduction"] = report["pickle_file_bytes"] / report["compact_bytes"]
+    print(f"\n{'section':<10}{'dtype':>9}{'count':>9}{'bytes':>10}")
+    for name, s in report["sections"].items():
+        print(f"{name:<10}{s['dtype']:>9}{s['count']:>9}{s['bytes']:>10}")
+    print(f"\nbest_model.pkl {report['pickle_file_bytes']:>9} bytes   -> {args.out}: "
+          f"{report['compact_bytes']} bytes ({report['size_reduction']:.1f}x smaller)")
+    for label, seconds in report["load_seconds"].items():
+        print(f"load: {label:<28} {seconds * 1000:8.1f} ms")
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+    print(f"Saved {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# File: compile_model.py
+# Compile best_model.pkl + scaler.pkl into a forest that takes raw inputs
+# (scaler folded into the split thresholds), verify it is exactly equivalent
+# to the scaler + model pipeline, and save it as an .npz artifact together
+# with the digest of the two pickles.  INFERENCE_ENGINE=folded serves this
+# file while the digest matches, and otherwise folds the scaler at startup.
+#
+#   python compile_model.py                      -> compiled_model.npz
+#   python compile_model.py --random 200000 --out /tmp/compiled.npz
+
+import argparse
+import os
+import warnings
+
+import joblib
+import numpy as np
+
+import config
+from artifacts import artifact_digest
+from features import REQUIRED_KEYS, build_feature_matrix, scale_features
+from forest_engine import FlatForest, fold_scaler
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_CSV = os.path.join(BASE_DIR, "..", "Jupyter Notebooks", "Question & Data", "insurance.csv")
+
+warnings.filterwarnings("ignore", message="X does not have valid feature names", category=UserWarning)
+
+
+def random_applicants(n, seed=0):
+    """Raw applicants over (and a little beyond) the Streamlit input ranges,
+    with fractional heights/weights so BMI lands between grid points."""
+    rng = np.random.default_rng(seed)
+    return np.column_stack([
+        rng.integers(10, 80, n),
+        rng.integers(0, 2, (n, 4)),
+        rng.uniform(130, 200, n),
+        rng.uniform(40, 150, n),
+        rng.integers(0, 2, (n, 2)),
+        rng.integers(0, 5, n)
+    ]).astype(np.float64)
+
+
+def boundary_probes(compiled, X, n, seed=0):
+    """Rows of X with one feature set exactly on a folded threshold or the next
+    float above it - the inputs where a wrong fold would flip a branch."""
+    rng = np.random.default_rng(seed)
+    internal = np.flatnonzero((compiled.left != np.arange(compiled.node_count))
+                              & np.isfinite(compiled.threshold))
+    nodes = rng.choice(internal, n)
+    rows = X[rng.integers(0, len(X), n)].copy()
+    values = compiled.threshold[nodes]
+    values = np.where(rng.integers(0, 2, n) == 1, np.nextafter(values, np.inf), values)
+    rows[np.arange(n), compiled.feature[nodes]] = values
+    return rows
+
+
+def verify_equivalence(compiled, model, scaler, X_raw):
+    """Number of rows where compiled(X_raw) != model(scaler(X_raw)); 0 means exact."""
+    columns = list(model.feature_names_in_)
+    expected = model.predict(scale_features(X_raw.copy(), columns, scaler))
+    return int(np.count_nonzero(compiled.predict(X_raw) != expected))
+
+
+def load_compiled(path=None, app_logger=None):
+    """Folded FlatForest, or None if the file is missing or was compiled from
+    a different best_model.pkl / scaler.pkl."""
+    path = path or config.COMPILED_MODEL_PATH
+    if not os.path.exists(path):
+        if app_logger is not None:
+            app_logger.warning("Compiled model %s not found; run python compile_model.py", path)
+        return None
+    with np.load(path, allow_pickle=False) as data:
+        digest = str(data["digest"]) if "digest" in data else None
+    if digest != artifact_digest():
+        if app_logger is not None:
+            app_logger.warning("Compiled model %s is stale (best_model.pkl or scaler.pkl changed); "
+                               "ignoring it", path)
+        return None
+    return FlatForest.load(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--out", default=config.COMPILED_MODEL_PATH)
+    parser.add_argument("--random", type=int, default=50000, help="random applicants to verify on")
+    args = parser.parse_args()
+
+    model = joblib.load(os.path.join(BASE_DIR, "best_model.pkl"))
+    scaler = joblib.load(os.path.join(BASE_DIR, "scaler.pkl"))
+    model.set_params(n_jobs=1)  # estimator-order summation, as in FlatForest
+    columns = list(model.feature_names_in_)
+
+    compiled = fold_scaler(FlatForest.from_model(model), scaler)
+
+    train = np.loadtxt(DATA_CSV, delimiter=",", skiprows=1, usecols=range(len(REQUIRED_KEYS)))
+    X_train = build_feature_matrix(train, columns)
+    X_random = build_feature_matrix(random_applicants(args.random), columns)
+    checks = [
+        ("insurance.csv", X_train),
+        ("random", X_random),
+        ("threshold probes", boundary_probes(compiled, X_random, args.random)),
+    ]
+    for label, X in checks:
+        mismatches = verify_equivalence(compiled, model, scaler, X)
+        print(f"{label:<18} rows={len(X):<8} mismatches={mismatches}")
+        if mismatches:
+            raise SystemExit(f"Compiled forest differs from scaler + model on {label}; not saving")
+
+    compiled.save(args.out, digest=artifact_digest())
+    print(f"Saved {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# File: config.py
+# Runtime settings for the prediction API, read once from the environment
+# so they can be changed per deployment (Render / gunicorn) without code edits.
+
+import os
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value not in (None, "") else default
+
+
+def _env_float(name, default):
+    value = os.environ.get(name)
+    return float(value) if value not in (None, "") else default
+
+
+# ---- Batch scoring ----
+MAX_BATCH_SIZE = _env_int("MAX_BATCH_SIZE", 10000)  # rows accepted by /predict_batch
+
+# ---- Inference engine ----
+# "flat": FlatForest lock-step arrays (forest_engine.py); calls above FLAT_MAX_ROWS rows go
+#         through the forest's sklearn trees instead (same predictions, faster for large batches)
+# "folded": flat engine with the StandardScaler folded into the split thresholds (no scaling step),
+#           read from compile_model.py's verified artifact when it is current
+# "sklearn": RandomForestRegressor.predict as loaded from best_model.pkl
+# "compact": flat engine read from compact_model.py's artifact; best_model.pkl is not unpickled
+# "surrogate": small model distilled from the forest by distill.py (within SURROGATE_MAX_* of it)
+# "pruned": first k trees cut at a depth cap, exported by prune_forest.py --export
+INFERENCE_ENGINE = os.environ.get("INFERENCE_ENGINE", "flat")
+FLAT_MAX_ROWS = _env_int("FLAT_MAX_ROWS", 200)  # lock-step walk up to here; break-even with sklearn ~200
+COMPACT_MODEL_PATH = os.environ.get(
+    "COMPACT_MODEL_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "compact_model.bin"))
+COMPILED_MODEL_PATH = os.environ.get(
+    "COMPILED_MODEL_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "compiled_model.npz"))
+PRUNED_MODEL_PATH = os.environ.get(
+    "PRUNED_MODEL_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "pruned_model.npz"))
+SURROGATE_PATH = os.environ.get(
+    "SURROGATE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "surrogate.pkl"))
+# A surrogate is only served when its held-out errors vs the forest are within these (premium units)
+SURROGATE_MAX_RMSE = _env_float("SURROGATE_MAX_RMSE", 1.0)
+SURROGATE_MAX_ERROR = _env_float("SURROGATE_MAX_ERROR", 10.0)
+
+# ---- Anytime prediction (anytime.py) ----
+# Requests with ?max_latency_ms / ?min_trees / ?tolerance evaluate the forest
+# this many trees at a time, stopping early when the budget is spent.
+ANYTIME_CHUNK_TREES = _env_int("ANYTIME_CHUNK_TREES", 25)
+
+# ---- Decision grid (decision_grid.py) ----
+# Directory of a compiled grid; /predict answers from it when the input lands on
+# the grid and falls back to the engine otherwise.  Set to "" to disable.
+DECISION_GRID_DIR = os.environ.get(
+    "DECISION_GRID_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "decision_grid"))
+
+# ---- Prediction cache (prediction_cache.py) ----
+PREDICTION_CACHE_SIZE = _env_int("PREDICTION_CACHE_SIZE", 10000)  # entries; 0 disables
+
+# ---- Explanations (explain.py, /explain) ----
+EXPLAIN_CACHE_SIZE = _env_int("EXPLAIN_CACHE_SIZE", 10000)  # explained inputs kept per worker; 0 disables
+EXPLAIN_MAX_BATCH_SIZE = _env_int("EXPLAIN_MAX_BATCH_SIZE", 1000)  # rows per /explain call; ~1.3 ms each
+
+# ---- Logging (request_log.py) ----
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()  # DEBUG adds per-request details
+LOG_QUEUE_SIZE = _env_int("LOG_QUEUE_SIZE", 10000)  # records buffered before dropping
+LOG_SAMPLE_RATES = os.environ.get("LOG_SAMPLE_RATES", "")  # e.g. "DEBUG=0.01,INFO=0.5"
+
+# ---- Micro-batching (microbatch.py) ----
+# Concurrent /predict calls that reach the engine are grouped for up to this
+# many ms (or MICROBATCH_MAX_SIZE rows) and scored together.  0 disables.
+MICROBATCH_WINDOW_MS = _env_float("MICROBATCH_WINDOW_MS", 0.0)
+MICROBATCH_MAX_SIZE = _env_int("MICROBATCH_MAX_SIZE", 64)
+
+# ---- ASGI server (asgi_app.py) ----
+ASGI_EXECUTOR_THREADS = _env_int("ASGI_EXECUTOR_THREADS", 4)  # threads running model calls
+ASGI_MAX_PENDING = _env_int("ASGI_MAX_PENDING", 1024)  # requests admitted to the executor queue
+ASGI_MAX_BODY_BYTES = _env_int("ASGI_MAX_BODY_BYTES", 64 * 1024)
+
+# ---- Streaming scoring (/predict_stream) ----
+STREAM_CHUNK_ROWS = _env_int("STREAM_CHUNK_ROWS", 1000)  # rows scored per vectorized call
+
+# ---- Metrics (metrics.py, served at /metrics) ----
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") == "1"
+SERVER_TIMING = os.environ.get("SERVER_TIMING", "0") == "1"  # per-stage durations in a Server-Timing header
+
+# ---- Profiling (profiling.py) ----
+# Fraction of /predict calls run under cProfile (0 = off); the aggregate is
+# written to PROFILE_DIR every PROFILE_DUMP_EVERY samples.  With an admin token
+# set, POST /admin/profile can change the rate at runtime.
+PROFILE_SAMPLE_RATE = _env_float("PROFILE_SAMPLE_RATE", 0.0)
+PROFILE_DIR = os.environ.get(
+    "PROFILE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles"))
+PROFILE_DUMP_EVERY = _env_int("PROFILE_DUMP_EVERY", 100)
+PROFILE_ADMIN_TOKEN = os.environ.get("PROFILE_ADMIN_TOKEN", "")  # empty: no admin endpoint
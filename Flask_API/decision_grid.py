@@ -0,0 +1,270 @@
+# File: decision_grid.py
+# Exact decision-grid compiler for the deployed forest.
+#
+# A Random Forest is piecewise constant: its output only depends on which side
+# of every split threshold each feature falls.  Cutting each raw input at the
+# (scaler-folded) thresholds the forest uses on it - plus the boundaries where
+# the derived one-hot columns flip - gives a grid whose cells all share one
+# prediction.  Height and Weight are coupled through BMI, so they form a single
+# axis whose classes are the reachable (height bin, weight bin, BMI bin) triples.
+#
+# The grid is enumerated over the Streamlit input ranges, every cell is scored
+# once, and the table is saved as a .npy that is memory-mapped at load time.
+# A lookup is a few bisects plus one array read; anything that lands outside
+# the enumerated cells returns None so the caller falls back to the model.
+#
+#   python decision_grid.py                  -> compiles + verifies ./decision_grid/
+
+import argparse
+import json
+import os
+import warnings
+from bisect import bisect_left
+from itertools import product
+
+import joblib
+import numpy as np
+
+from artifacts import MODEL_PATH, SCALER_PATH, artifact_digest
+from features import REQUIRED_KEYS, build_feature_matrix, scale_features
+from forest_engine import FlatForest, fold_scaler
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_CSV = os.path.join(BASE_DIR, "..", "Jupyter Notebooks", "Question & Data", "insurance.csv")
+
+# Input ranges enforced by Streamlit_APP/app.py (integers)
+DOMAIN = {
+    "Age": range(18, 67),
+    "Height": range(145, 189),
+    "Weight": range(51, 133),
+    "Number_of_Major_Surgeries": range(0, 4),
+}
+FLAG_DOMAIN = range(0, 2)
+
+# Where derive_features() flips the one-hot columns.  Bins are
+# #{cuts < x}, so a cut just below b puts b itself in the upper bin.
+AGE_GROUP_CUTS = [29.5, 39.5, 49.5, 59.5]  # Age is int(): groups start at 30/40/50/60
+BMI_CATEGORY_CUTS = [float(np.nextafter(b, -np.inf)) for b in (18.5, 25.0, 30.0)]
+
+DERIVED_COLUMNS = {
+    "BMI", "BMI_Category_Normal", "BMI_Category_Overweight", "BMI_Category_Obese",
+    "Age_Group_30-39", "Age_Group_40-49", "Age_Group_50-59", "Age_Group_60+"
+}
+
+# Table axes: "HW" is the coupled Height/Weight/BMI axis
+SCALAR_AXES = [k for k in REQUIRED_KEYS if k not in ("Height", "Weight")]
+AXES = ["HW"] + SCALAR_AXES
+
+TABLE_FILE = "table.npy"
+HW_FILE = "hw_lut.npy"
+META_FILE = "meta.json"
+
+warnings.filterwarnings("ignore", message="X does not have valid feature names", category=UserWarning)
+
+
+def _bmi(height, weight):
+    return weight / ((height / 100.0) ** 2)  # same expression as predict()
+
+
+def _split_points(forest):
+    """Sorted unique finite thresholds per column of a raw-input forest."""
+    internal = forest.left != np.arange(forest.node_count)
+    cuts = {}
+    for j, name in enumerate(forest.feature_names_in_):
+        t = forest.threshold[internal & (forest.feature == j)]
+        cuts[str(name)] = np.unique(t[np.isfinite(t)]).tolist()
+    return cuts
+
+
+class DecisionGrid:
+    def __init__(self, cuts, lo, bin_maps, table, hw_lut, digest=None):
+        self.cuts = cuts          # axis -> sorted cut points (Height/Weight/BMI for the HW axis)
+        self.lo = lo              # axis -> first bin index the maps/LUT start at
+        self.bin_maps = bin_maps  # scalar axis -> (bin - lo) -> table index, -1 if unreached
+        self.table = table        # float64, one prediction per cell, axes in AXES order
+        self.hw_lut = hw_lut      # (h bin, w bin, bmi bin) - lo -> HW class, -1 if unreached
+        self.digest = digest      # artifact_digest() of the model it was compiled from
+        self._scalar = [(key, cuts[key], lo[key], bin_maps[key]) for key in SCALAR_AXES]
+
+    # ---- Compile ----
+    @classmethod
+    def compile(cls, model, scaler, max_cells=5_000_000, chunk_cells=100_000):
+        columns = [str(c) for c in model.feature_names_in_]
+        unknown = set(columns) - set(REQUIRED_KEYS) - DERIVED_COLUMNS
+        if unknown:
+            raise ValueError(f"Cannot grid columns outside the derivation rules: {sorted(unknown)}")
+
+        forest = fold_scaler(FlatForest.from_model(model), scaler)
+        split = _split_points(forest)
+        cuts = {key: split.get(key, []) for key in REQUIRED_KEYS + ["BMI"]}
+        cuts["Age"] = sorted(set(cuts["Age"]) | set(AGE_GROUP_CUTS))
+        cuts["BMI"] = sorted(set(cuts["BMI"]) | set(BMI_CATEGORY_CUTS))
+
+        # ---- Scalar axes: representative value per reachable bin ----
+        lo, bin_maps, reps = {}, {}, {}
+        for key in SCALAR_AXES:
+            first = {}
+            for v in DOMAIN.get(key, FLAG_DOMAIN):
+                first.setdefault(bisect_left(cuts[key], v), v)
+            lo[key] = min(first)
+            bin_maps[key] = [-1] * (max(first) - lo[key] + 1)
+            for i, b in enumerate(sorted(first)):
+                bin_maps[key][b - lo[key]] = i
+            reps[key] = [first[b] for b in sorted(first)]
+
+        # ---- Coupled Height/Weight axis ----
+        triples = {}
+        for h, w in product(DOMAIN["Height"], DOMAIN["Weight"]):
+            key = (bisect_left(cuts["Height"], h), bisect_left(cuts["Weight"], w),
+                   bisect_left(cuts["BMI"], _bmi(float(h), float(w))))
+            triples.setdefault(key, (h, w))
+        keys = np.array(sorted(triples))
+        hw_lo = keys.min(axis=0)
+        hw_lut = np.full(tuple(keys.max(axis=0) - hw_lo + 1), -1, dtype=np.int32)
+        hw_reps = []
+        for cls_id, key in enumerate(sorted(triples)):
+            hw_lut[tuple(np.array(key) - hw_lo)] = cls_id
+            hw_reps.append(triples[key])
+        for axis, start in zip(("Height", "Weight", "BMI"), hw_lo):
+            lo[axis] = int(start)
+
+        shape = (len(hw_reps),) + tuple(len(reps[key]) for key in SCALAR_AXES)
+        n_cells = int(np.prod(shape))
+        if n_cells > max_cells:
+            raise ValueError(f"Grid has {n_cells} cells (> max_cells={max_cells})")
+
+        # ---- Score one representative row per cell (chunked, flat cell order) ----
+        hw_reps = np.array(hw_reps, dtype=np.float64)
+        reps = {key: np.asarray(reps[key], dtype=np.float64) for key in SCALAR_AXES}
+        table = np.empty(n_cells)
+        for start in range(0, n_cells, chunk_cells):
+            cell = np.unravel_index(np.arange(start, min(start + chunk_cells, n_cells)), shape)
+            raw = np.zeros((len(cell[0]), len(REQUIRED_KEYS)))
+            raw[:, REQUIRED_KEYS.index("Height")] = hw_reps[cell[0], 0]
+            raw[:, REQUIRED_KEYS.index("Weight")] = hw_reps[cell[0], 1]
+            for i, key in enumerate(SCALAR_AXES):
+                raw[:, REQUIRED_KEYS.index(key)] = reps[key][cell[i + 1]]
+            table[start:start + len(raw)] = forest.predict(build_feature_matrix(raw, columns))
+
+        return cls(cuts, lo, bin_maps, table.reshape(shape), hw_lut)
+
+    # ---- Persist (table is memory-mapped on load) ----
+    def save(self, directory, digest=None):
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, TABLE_FILE), self.table)
+        np.save(os.path.join(directory, HW_FILE), self.hw_lut)
+        with open(os.path.join(directory, META_FILE), "w") as f:
+            json.dump({"axes": AXES, "cuts": self.cuts, "lo": self.lo, "bin_maps": self.bin_maps,
+                       "digest": digest or self.digest}, f)
+
+    @classmethod
+    def load(cls, directory):
+        with open(os.path.join(directory, META_FILE)) as f:
+            meta = json.load(f)
+        if meta["axes"] != AXES:
+            raise ValueError(f"Grid in {directory} has axes {meta['axes']}, expected {AXES}")
+        table = np.load(os.path.join(directory, TABLE_FILE), mmap_mode="r")
+        hw_lut = np.load(os.path.join(directory, HW_FILE))
+        return cls(meta["cuts"], meta["lo"], meta["bin_maps"], table, hw_lut, meta.get("digest"))
+
+    # ---- Lookup ----
+    def lookup(self, row):
+        """Prediction for a feature dict (the ten inputs + BMI), or None if off-grid."""
+        idx = [0]
+        h = bisect_left(self.cuts["Height"], row["Height"]) - self.lo["Height"]
+        w = bisect_left(self.cuts["Weight"], row["Weight"]) - self.lo["Weight"]
+        b = bisect_left(self.cuts["BMI"], row["BMI"]) - self.lo["BMI"]
+        lut = self.hw_lut
+        if not (0 <= h < lut.shape[0] and 0 <= w < lut.shape[1] and 0 <= b < lut.shape[2]):
+            return None
+        idx[0] = int(lut[h, w, b])
+        if idx[0] < 0:
+            return None
+        for key, cuts, lo, bin_map in self._scalar:
+            i = bisect_left(cuts, row[key]) - lo
+            if not 0 <= i < len(bin_map) or bin_map[i] < 0:
+                return None
+            idx.append(bin_map[i])
+        return float(self.table[tuple(idx)])
+
+    def lookup_many(self, raw):
+        """Vectorized lookup for an (n, 10) raw array -> (predictions, hit mask)."""
+        height = raw[:, REQUIRED_KEYS.index("Height")]
+        weight = raw[:, REQUIRED_KEYS.index("Weight")]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            bmi = _bmi(height, weight)
+        hit = np.ones(len(raw), dtype=bool)
+
+        def bins(axis, values, size):
+            i = np.searchsorted(self.cuts[axis], values, side="left") - self.lo[axis]
+            hit[:] &= (i >= 0) & (i < size)
+            return np.clip(i, 0, size - 1)
+
+        lut = self.hw_lut
+        hw = lut[bins("Height", height, lut.shape[0]), bins("Weight", weight, lut.shape[1]),
+                 bins("BMI", bmi, lut.shape[2])]
+        hit &= hw >= 0
+        idx = [np.maximum(hw, 0)]
+        for key, _, _, bin_map in self._scalar:
+            i = np.asarray(bin_map)[bins(key, raw[:, REQUIRED_KEYS.index(key)], len(bin_map))]
+            hit &= i >= 0
+            idx.append(np.maximum(i, 0))
+        pred = np.where(hit, self.table[tuple(idx)], np.nan)
+        return pred, hit
+
+
+def load_grid(directory, app_logger=None):
+    """Load a compiled grid, or None if it is missing or was built from other artifacts."""
+    if not os.path.exists(os.path.join(directory, META_FILE)):
+        return None
+    grid = DecisionGrid.load(directory)
+    if grid.digest != artifact_digest():
+        if app_logger is not None:
+            app_logger.warning("Decision grid %s is stale (model/scaler changed); ignoring it", directory)
+        return None
+    return grid
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile and verify the decision grid")
+    parser.add_argument("--out", default=os.path.join(BASE_DIR, "decision_grid"))
+    parser.add_argument("--random", type=int, default=200000, help="random applicants to verify on")
+    args = parser.parse_args()
+
+    model = joblib.load(MODEL_PATH)
+    scaler = joblib.load(SCALER_PATH)
+    model.set_params(n_jobs=1)
+    columns = list(model.feature_names_in_)
+
+    grid = DecisionGrid.compile(model, scaler)
+    print(f"cells={grid.table.size} shape={grid.table.shape} size={grid.table.nbytes / 1024:.1f} KiB")
+
+    # ---- Verify: every hit must equal scaler + model exactly ----
+    rng = np.random.default_rng(0)
+    n = args.random
+    integer = np.column_stack([
+        rng.integers(18, 67, n), rng.integers(0, 2, (n, 4)), rng.integers(145, 189, n),
+        rng.integers(51, 133, n), rng.integers(0, 2, (n, 2)), rng.integers(0, 4, n)
+    ]).astype(np.float64)
+    fractional = integer.copy()
+    fractional[:, REQUIRED_KEYS.index("Height")] += rng.uniform(-1, 1, n)
+    fractional[:, REQUIRED_KEYS.index("Weight")] += rng.uniform(-1, 1, n)
+    train = np.loadtxt(DATA_CSV, delimiter=",", skiprows=1, usecols=range(len(REQUIRED_KEYS)))
+
+    for label, raw in (("insurance.csv", train), ("random integer", integer), ("random fractional", fractional)):
+        pred, hit = grid.lookup_many(raw)
+        expected = model.predict(scale_features(build_feature_matrix(raw, columns), columns, scaler))
+        mismatches = int(np.count_nonzero(pred[hit] != expected[hit]))
+        singles = [grid.lookup(dict(zip(REQUIRED_KEYS, r), BMI=_bmi(r[5], r[6]))) for r in raw[:2000]]
+        single_ok = all((s is None and not h) or s == p for s, h, p in zip(singles, hit, pred))
+        print(f"{label:<18} rows={len(raw):<8} hits={int(hit.sum()):<8} mismatches={mismatches} "
+              f"single-row lookup consistent={single_ok}")
+        if mismatches or not single_ok:
+            raise SystemExit(f"Decision grid differs from scaler + model on {label}; not saving")
+
+    grid.save(args.out, artifact_digest())
+    print(f"Saved {args.out}")
+
+
+if __name__ == "__main__":
+    main()
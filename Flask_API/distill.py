@@ -0,0 +1,196 @@
+# File: distill.py
+# Distill the deployed forest into a small surrogate model.
+#
+# Dense synthetic applicants over the validated input ranges (validation.py),
+# half with fractional heights/weights, are labelled by best_model.pkl and
+# used to fit candidates from cheapest to most expensive: single decision
+# trees of growing depth, then a shallow gradient-boosted model.  The first
+# candidate whose predictions stay within the tolerance of the forest's on the
+# held-out set (fresh synthetic applicants + every insurance.csv row) is saved.
+# Nothing is saved when no candidate passes.
+#
+# Surrogates take the same scaled MODEL_COLUMNS matrix as the forest, so the
+# API can serve one as a drop-in engine (INFERENCE_ENGINE=surrogate); trees
+# are served through FlatForest.  Loading re-checks the recorded held-out
+# errors against SURROGATE_MAX_RMSE / SURROGATE_MAX_ERROR and the digest of
+# the model/scaler it was distilled from.
+#
+#   python distill.py                                  -> surrogate.pkl
+#   python distill.py --max-rmse 5 --max-error 25 --candidates tree:6 tree:8 gbm
+
+import argparse
+import os
+import time
+import warnings
+from types import SimpleNamespace
+
+import joblib
+import numpy as np
+
+import config
+from artifacts import MODEL_PATH, SCALER_PATH, artifact_digest
+from features import REQUIRED_KEYS, build_feature_matrix, scale_features
+from forest_engine import FlatForest
+from validation import LOWER, UPPER
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_CSV = os.path.join(BASE_DIR, "..", "Jupyter Notebooks", "Question & Data", "insurance.csv")
+CANDIDATES = ("tree:4", "tree:6", "tree:8", "tree:10", "tree:12", "tree:none", "gbm")
+
+warnings.filterwarnings("ignore", message="X does not have valid feature names", category=UserWarning)
+
+
+class SurrogateModel:
+    """A fitted non-tree surrogate with the engine contract (.predict, .feature_names_in_)."""
+
+    def __init__(self, estimator, columns):
+        self.estimator = estimator
+        self.feature_names_in_ = np.asarray(columns, dtype=object)
+
+    def predict(self, X):
+        return self.estimator.predict(np.asarray(X, dtype=np.float64))
+
+
+def synthetic_applicants(n, seed):
+    """Raw inputs spread over the validated ranges; half the rows get
+    fractional Height/Weight so BMI falls between integer grid points."""
+    rng = np.random.default_rng(seed)
+    raw = np.column_stack([rng.integers(lo, hi + 1, n) for lo, hi in zip(LOWER, UPPER)]).astype(np.float64)
+    fractional = rng.random(n) < 0.5
+    for key in ("Height", "Weight"):
+        j = REQUIRED_KEYS.index(key)
+        raw[fractional, j] = rng.uniform(LOWER[j], UPPER[j], int(fractional.sum()))
+    return raw
+
+
+def make_candidate(spec):
+    from sklearn.ensemble import HistGradientBoostingRegressor
+    from sklearn.tree import DecisionTreeRegressor
+
+    if spec.startswith("tree:"):
+        depth = spec.split(":", 1)[1]
+        return DecisionTreeRegressor(max_depth=None if depth == "none" else int(depth), random_state=0)
+    if spec == "gbm":
+        return HistGradientBoostingRegressor(max_iter=300, max_depth=6, learning_rate=0.1, random_state=0)
+    raise ValueError(f"Unknown candidate {spec!r}; expected tree:<depth|none> or gbm")
+
+
+def as_engine(estimator, columns):
+    """Engine for a fitted surrogate: FlatForest for a single tree (one
+    lock-step walk, no sklearn dispatch), else a SurrogateModel."""
+    if hasattr(estimator, "tree_"):
+        return FlatForest.from_model(SimpleNamespace(estimators_=[estimator], feature_names_in_=columns))
+    return SurrogateModel(estimator, columns)
+
+
+def errors(pred, reference):
+    diff = pred - reference
+    return {"rmse": float(np.sqrt(np.mean(diff ** 2))), "max_error": float(np.abs(diff).max()),
+            "mismatches": int(np.count_nonzero(diff))}
+
+
+def within(holdout, max_rmse, max_error):
+    return all(m["rmse"] <= max_rmse and m["max_error"] <= max_error for m in holdout.values())
+
+
+def load_surrogate(path=None, max_rmse=None, max_error=None, app_logger=None):
+    """Surrogate engine, or None if the artifact is missing, was distilled
+    from other model/scaler files, or is outside the tolerance."""
+    path = path or config.SURROGATE_PATH
+    max_rmse = config.SURROGATE_MAX_RMSE if max_rmse is None else max_rmse
+    max_error = config.SURROGATE_MAX_ERROR if max_error is None else max_error
+
+    def reject(reason, *args):
+        if app_logger is not None:
+            app_logger.warning("Surrogate %s " + reason + "; falling back to the forest", path, *args)
+
+    if not os.path.exists(path):
+        return reject("not found (run python distill.py)")
+    artifact = joblib.load(path)
+    if artifact["digest"] != artifact_digest():
+        return reject("is stale (model/scaler changed)")
+    if not within(artifact["holdout"], max_rmse, max_error):
+        return reject("exceeds tolerance rmse<=%s max_error<=%s (held-out: %s)",
+                      max_rmse, max_error, artifact["holdout"])
+    return as_engine(artifact["estimator"], artifact["columns"])
+
+
+def _latency(engine, X, repeat=2000):
+    row = X[:1]
+    best = float("inf")
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            engine.predict(row)
+        best = min(best, (time.perf_counter() - start) / repeat)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distill best_model.pkl into a small surrogate")
+    parser.add_argument("--out", default=config.SURROGATE_PATH)
+    parser.add_argument("--train", type=int, default=1_000_000, help="synthetic training rows")
+    parser.add_argument("--holdout", type=int, default=200_000, help="synthetic held-out rows")
+    parser.add_argument("--candidates", nargs="+", default=list(CANDIDATES),
+                        help="tried in order; the first within tolerance is saved")
+    parser.add_argument("--max-rmse", type=float, default=config.SURROGATE_MAX_RMSE)
+    parser.add_argument("--max-error", type=float, default=config.SURROGATE_MAX_ERROR)
+    args = parser.parse_args()
+
+    model = joblib.load(MODEL_PATH)
+    scaler = joblib.load(SCALER_PATH)
+    model.set_params(n_jobs=1)
+    columns = list(model.feature_names_in_)
+
+    def matrix(raw):
+        return scale_features(build_feature_matrix(raw, columns), columns, scaler)
+
+    start = time.perf_counter()
+    X_train = matrix(synthetic_applicants(args.train, seed=1))
+    y_train = model.predict(X_train)
+    csv = np.loadtxt(DATA_CSV, delimiter=",", skiprows=1)
+    holdout_sets = {
+        "synthetic": matrix(synthetic_applicants(args.holdout, seed=2)),
+        "insurance.csv": matrix(csv[:, :len(REQUIRED_KEYS)]),
+    }
+    references = {label: model.predict(X) for label, X in holdout_sets.items()}
+    print(f"labelled {args.train} training rows in {time.perf_counter() - start:.1f}s")
+
+    forest_engine = FlatForest.from_model(model)
+    forest_latency = _latency(forest_engine, holdout_sets["insurance.csv"])
+    for spec in args.candidates:
+        start = time.perf_counter()
+        estimator = make_candidate(spec).fit(X_train, y_train)
+        fit_seconds = time.perf_counter() - start
+        engine = as_engine(estimator, columns)
+        holdout = {label: errors(engine.predict(X), references[label]) for label, X in holdout_sets.items()}
+        size = estimator.tree_.node_count if hasattr(estimator, "tree_") else None
+        latency = _latency(engine, holdout_sets["insurance.csv"])
+        print(f"{spec:<10} fit={fit_seconds:6.1f}s nodes={size or '-':<6} 1-row={latency * 1e6:7.1f} us "
+              + "  ".join(f"{label}: rmse={m['rmse']:.2f} max={m['max_error']:.2f} mismatches={m['mismatches']}"
+                          for label, m in holdout.items()))
+        if not within(holdout, args.max_rmse, args.max_error):
+            continue
+
+        # vs the real premiums, for context next to the forest's own fit
+        truth = csv[:, len(REQUIRED_KEYS)]
+        r2 = {name: float(1 - np.sum((p - truth) ** 2) / np.sum((truth - truth.mean()) ** 2))
+              for name, p in (("forest", references["insurance.csv"]),
+                              ("surrogate", engine.predict(holdout_sets["insurance.csv"])))}
+        joblib.dump({
+            "kind": spec,
+            "estimator": estimator,
+            "columns": columns,
+            "digest": artifact_digest(),
+            "holdout": holdout,
+            "tolerance": {"max_rmse": args.max_rmse, "max_error": args.max_error},
+        }, args.out)
+        print(f"insurance.csv R² vs actual premiums: forest={r2['forest']:.4f} surrogate={r2['surrogate']:.4f}")
+        print(f"1-row latency: forest (flat) {forest_latency * 1e6:.1f} us -> {spec} {latency * 1e6:.1f} us")
+        print(f"Saved {args.out} ({spec}, within rmse<={args.max_rmse} max_error<={args.max_error})")
+        return
+    raise SystemExit(f"No candidate within rmse<={args.max_rmse} max_error<={args.max_error}; nothing saved")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+# File: explain.py
+# Exact path-dependent TreeSHAP for the deployed forest, vectorized across
+# rows and trees.
+#
+# For one tree, the path-dependent value function is a sum over leaves: a
+# leaf with value v contributes v * prod over the distinct features j split on
+# along its path of
+#   o_j  (1 if x satisfies every split on j along the path, else 0)  if j is known
+#   z_j  (product of the cover fractions of those splits)             otherwise.
+# The Shapley value of feature i in such a product game is
+#   v * (o_i - z_i) * integral_0^1 prod_{j != i} (z_j (1 - t) + o_j t) dt,
+# and for a path over d features the integrand is a polynomial of degree d - 1,
+# so a Gauss-Legendre rule with ceil(d / 2) nodes integrates it exactly.
+# Given the tree, a leaf's contributions depend on x only through which of
+# its d split intervals x falls in, so they are computed once, at load, for
+# all 2**d such patterns (14 MB for the deployed forest, whose paths use at
+# most 8 features).  A group whose table would exceed TABLE_MAX_BYTES (deep
+# paths: it doubles with every feature) evaluates the integral per row
+# instead.  A request then takes a few array operations per group of leaves
+# with the same d, over a block of rows at once: test the intervals, look the
+# pattern's values up (or compute them), and sum them per (row, feature) with
+# one bincount.  This is the same value
+# function and result as shap.TreeExplainer(model, feature_perturbation=
+# "tree_path_dependent"); base value + sum of the values = model.predict.
+#
+# Attributions to the ten raw inputs sum the derived columns into the input
+# they come from: Age_Group_* into Age, and BMI / BMI_Category_* shared
+# equally by Height and Weight.
+#
+#   python explain.py        -> offline check against a brute-force Shapley computation
+
+import numpy as np
+
+from features import REQUIRED_KEYS
+
+CHUNK_ROWS = 32  # rows per pass over the leaves; larger blocks gain nothing and grow the temporaries
+TABLE_MAX_BYTES = 64 << 20  # per group of leaves; larger groups compute contributions per row
+
+
+class TreeExplainer:
+    def __init__(self, model):
+        """Precompute the leaf/feature pairs of every tree of a fitted forest,
+        grouped by d, the number of distinct features on the leaf's path."""
+        self.columns = list(model.feature_names_in_)
+        n_trees = len(model.estimators_)
+        self.expected_value = float(np.mean([est.tree_.value[0, 0, 0] for est in model.estimators_]))
+
+        by_size = {}  # d -> [(feature, low, high, z) * d, leaf value] rows
+        for est in model.estimators_:
+            for value, path in _leaf_paths(est.tree_):
+                if path:  # a single-leaf tree only moves the base value
+                    by_size.setdefault(len(path), []).append(
+                        ([(j,) + bounds for j, bounds in sorted(path.items())], value / n_trees))
+        self.groups = [_LeafGroup(d, leaves) for d, leaves in sorted(by_size.items())]
+        self.raw_groups = raw_groups(self.columns)
+
+    @property
+    def n_pairs(self):
+        return sum(g.feature.size for g in self.groups)
+
+    def shap_values(self, X):
+        """(n, n_features) SHAP values for the rows of X (the model's scaled input)."""
+        X = np.asarray(np.asarray(X, dtype=np.float32), dtype=np.float64)  # trees compare float32 features
+        n_features = len(self.columns)
+        out = np.zeros((X.shape[0], n_features))
+        for start in range(0, X.shape[0], CHUNK_ROWS):
+            block = X[start:start + CHUNK_ROWS]
+            flat = out[start:start + len(block)].reshape(-1)  # view: (row, feature) -> row * n_features + feature
+            rows = np.arange(len(block))[:, None, None] * n_features
+            for group in self.groups:
+                index = (rows + group.feature).ravel()
+                flat += np.bincount(index, group.contributions(block).ravel(), minlength=flat.size)
+        return out
+
+    def raw_values(self, phi):
+        """SHAP values summed into the ten raw inputs (REQUIRED_KEYS order)."""
+        return phi @ self.raw_groups
+
+
+class _LeafGroup:
+    """Leaves whose paths split on exactly d distinct features, as (leaves, d)
+    arrays, with the contributions of every pattern of followed splits when
+    that table fits in TABLE_MAX_BYTES (else None)."""
+
+    def __init__(self, d, leaves):
+        pairs = np.array([p for p, _ in leaves])  # (leaves, d, 4): feature, low, high, z
+        self.d = d
+        self.n_leaves = len(leaves)
+        self.feature = pairs[:, :, 0].astype(np.intp)
+        self.lo, self.hi, self.zero = pairs[:, :, 1], pairs[:, :, 2], pairs[:, :, 3]
+        self.scale = np.array([v for _, v in leaves])[:, None]
+        self.table = None
+        if d <= 16 and 2 ** d * self.n_leaves * d * 8 <= TABLE_MAX_BYTES:
+            # pattern = sum of bit[j] over followed splits j, < 2**d <= 65536: exact in uint16
+            self.bit = (1 << np.arange(d)).astype(np.uint16)
+            self.leaf = np.arange(self.n_leaves)
+            patterns = (np.arange(2 ** d)[:, None] >> np.arange(d)) & 1  # (2**d, d)
+            follows = np.broadcast_to(patterns[:, None, :], (2 ** d, self.n_leaves, d))
+            # (2**d * leaves, d): row pattern * n_leaves + leaf, so rows with the same
+            # pattern read neighbouring leaves
+            self.table = _shapley(follows, self.zero, d, self.scale).reshape(-1, d)
+
+    def contributions(self, X):
+        """(rows, leaves, d) Shapley contributions of every leaf/feature pair."""
+        x = X[:, self.feature]
+        follows = (x > self.lo) & (x <= self.hi)
+        if self.table is None:
+            return _shapley(follows, self.zero, self.d, self.scale)
+        pattern = follows.view(np.uint8) @ self.bit
+        return self.table[pattern.astype(np.intp) * self.n_leaves + self.leaf]
+
+
+def _shapley(follows, zero, d, scale):
+    """Contributions v * (o_i - z_i) * integral prod_{j != i} (z_j (1 - t) + o_j t) dt
+    for (..., leaves, d) patterns o, with the ceil(d / 2)-node Gauss-Legendre rule."""
+    nodes, weights = np.polynomial.legendre.leggauss((d + 1) // 2)
+    t = ((nodes + 1) / 2)[:, None, None]
+    factor = zero * (1 - t) + follows[..., None, :, :] * t  # (..., nodes, leaves, d)
+    product = factor[..., 0].copy()
+    for j in range(1, d):
+        product *= factor[..., j]
+    integral = np.einsum("k,...kld->...ld", weights / 2, product[..., None] / factor)
+    return integral * (follows - zero) * scale
+
+
+def _leaf_paths(tree):
+    """(leaf value, {feature: (low, high, z)}) for every leaf of a sklearn tree:
+    the leaf is reached iff low < x_feature <= high for every feature on its
+    path, and z is the product of the cover fractions of those splits."""
+    left, right = tree.children_left, tree.children_right
+    feature, threshold = tree.feature, tree.threshold
+    cover = tree.weighted_n_node_samples
+    stack = [(0, {})]
+    while stack:
+        node, path = stack.pop()
+        if left[node] == -1:
+            yield tree.value[node, 0, 0], path
+            continue
+        j, t = int(feature[node]), threshold[node]
+        low, high, z = path.get(j, (-np.inf, np.inf, 1.0))
+        for child, bounds in ((left[node], (low, min(high, t))), (right[node], (max(low, t), high))):
+            stack.append((child, {**path, j: bounds + (z * cover[child] / cover[node],)}))
+
+
+def raw_groups(columns):
+    """(n_columns, 10) matrix summing model-column attributions into REQUIRED_KEYS."""
+    groups = np.zeros((len(columns), len(REQUIRED_KEYS)))
+    for c, name in enumerate(columns):
+        if name in REQUIRED_KEYS:
+            groups[c, REQUIRED_KEYS.index(name)] = 1.0
+        elif name.startswith("Age_Group"):
+            groups[c, REQUIRED_KEYS.index("Age")] = 1.0
+        elif name == "BMI" or name.startswith("BMI_Category"):
+            groups[c, REQUIRED_KEYS.index("Height")] = 0.5
+            groups[c, REQUIRED_KEYS.index("Weight")] = 0.5
+        else:
+            raise ValueError(f"No raw input for model column {name!r}")
+    return groups
+
+
+def _brute_force(tree, x, n_features):
+    """Shapley values of one tree's path-dependent value function by enumerating
+    every subset of the features it splits on (reference for the offline check)."""
+    from itertools import combinations
+    from math import factorial
+
+    x = np.float64(np.float32(x))
+    used = sorted(set(int(f) for f in tree.feature[tree.children_left != -1]))
+
+    def value(known, node=0):
+        if tree.children_left[node] == -1:
+            return tree.value[node, 0, 0]
+        j = tree.feature[node]
+        left, right = tree.children_left[node], tree.children_right[node]
+        if j in known:
+            return value(known, left if x[j] <= tree.threshold[node] else right)
+        cover = tree.weighted_n_node_samples
+        return (cover[left] * value(known, left) + cover[right] * value(known, right)) / cover[node]
+
+    d = len(used)
+    phi = np.zeros(n_features)
+    cache = {}
+    for size in range(d + 1):
+        for subset in combinations(used, size):
+            cache[subset] = value(set(subset))
+    for i in used:
+        others = [j for j in used if j != i]
+        for size in range(d):
+            weight = factorial(size) * factorial(d - size - 1) / factorial(d)
+            for subset in combinations(others, size):
+                phi[i] += weight * (cache[tuple(sorted(subset + (i,)))] - cache[subset])
+    return phi
+
+
+if __name__ == "__main__":
+    # Offline check: python explain.py
+    import os
+    import time
+    import warnings
+    from types import SimpleNamespace
+
+    import joblib
+
+    from features import build_feature_matrix, scale_features
+
+    warnings.filterwarnings("ignore", message="X does not have valid feature names", category=UserWarning)
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    model = joblib.load(os.path.join(base_dir, "best_model.pkl"))
+    scaler = joblib.load(os.path.join(base_dir, "scaler.pkl"))
+    model.set_params(n_jobs=1)
+    columns = list(model.feature_names_in_)
+    csv_path = os.path.join(base_dir, "..", "Jupyter Notebooks", "Question & Data", "insurance.csv")
+    raw = np.loadtxt(csv_path, delimiter=",", skiprows=1, usecols=range(len(REQUIRED_KEYS)))
+    X = scale_features(build_feature_matrix(raw, columns), columns, scaler)
+
+    start = time.perf_counter()
+    explainer = TreeExplainer(model)
+    print(f"built in {time.perf_counter() - start:.2f}s: {explainer.n_pairs} leaf/feature pairs, "
+          f"path sizes {[g.d for g in explainer.groups]}")
+
+    # ---- Local accuracy: base value + sum of SHAP values = prediction ----
+    start = time.perf_counter()
+    phi = explainer.shap_values(X)
+    seconds = time.perf_counter() - start
+    gap = np.abs(explainer.expected_value + phi.sum(axis=1) - model.predict(X)).max()
+    print(f"insurance.csv rows={len(X)} {seconds / len(X) * 1e3:.2f} ms/row  max |base + sum - predict| = {gap:.3g}")
+    assert gap < 1e-6
+
+    # ---- Exactness: single trees against brute-force Shapley values ----
+    worst = 0.0
+    for t in (0, 1, 2):
+        one = TreeExplainer(SimpleNamespace(estimators_=[model.estimators_[t]], feature_names_in_=columns))
+        for x in X[:5]:
+            worst = max(worst, np.abs(one.shap_values(x[None])[0]
+                                      - _brute_force(model.estimators_[t].tree_, x, len(columns))).max())
+    print(f"3 trees x 5 rows vs brute force: max |difference| = {worst:.3g}")
+    assert worst < 1e-6
@@ -0,0 +1,92 @@
+# File: features.py
+# Feature derivation for the prediction API (vectorized with NumPy so a whole
+# batch of applicants is featurized in one pass).
+
+import numpy as np
+
+CONT_FEATURES = ['Age', 'Height', 'Weight', 'BMI']
+
+# Ten raw inputs expected from UI/API (we derive the rest)
+REQUIRED_KEYS = [
+    "Age",
+    "Diabetes",
+    "Blood_Pressure_Problems",
+    "Any_Transplants",
+    "Any_Chronic_Diseases",
+    "Height",
+    "Weight",
+    "Known_Allergies",
+    "History_of_Cancer_in_Family",
+    "Number_of_Major_Surgeries"
+]
+
+# Same coercion as predict(): Height/Weight go through float(), the rest int()
+FLOAT_KEYS = {"Height", "Weight"}
+
+
+def raw_columns(raw):
+    """{key: 1-D column} for raw inputs given either as an (n, 10) array in
+    REQUIRED_KEYS order or already as a mapping of columns (e.g. zero-copy
+    views of Arrow columns)."""
+    if isinstance(raw, dict):
+        return raw
+    return {key: raw[:, j] for j, key in enumerate(REQUIRED_KEYS)}
+
+
+def select_rows(raw, rows):
+    """raw[rows] for either raw-input form."""
+    if isinstance(raw, dict):
+        return {key: col[rows] for key, col in raw.items()}
+    return raw[rows]
+
+
+def derive_features(raw):
+    """Map column name -> array for the ten raw inputs plus BMI, BMI category
+    and age group, using the same rules as predict()."""
+    cols = dict(raw_columns(raw))
+    age = cols["Age"]
+    height = cols["Height"]
+    weight = cols["Weight"]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        bmi = weight / ((height / 100.0) ** 2)
+
+    cols.update({
+        'BMI': bmi,
+        'BMI_Category_Normal': (18.5 <= bmi) & (bmi < 25),
+        'BMI_Category_Overweight': (25 <= bmi) & (bmi < 30),
+        'BMI_Category_Obese': bmi >= 30,
+        'Age_Group_30-39': (30 <= age) & (age <= 39),
+        'Age_Group_40-49': (40 <= age) & (age <= 49),
+        'Age_Group_50-59': (50 <= age) & (age <= 59),
+        'Age_Group_60+': age >= 60
+    })
+    return cols
+
+
+def build_feature_matrix(raw, columns):
+    """Unscaled float64 model matrix with `columns` in order (missing -> 0,
+    like df.reindex(columns=..., fill_value=0))."""
+    cols = derive_features(raw)
+    X = np.zeros((len(cols["Age"]), len(columns)))
+    for j, name in enumerate(columns):
+        if name in cols:
+            X[:, j] = cols[name]
+    return X
+
+
+def scale_features(X, columns, scaler):
+    """Apply the fitted StandardScaler to its columns of X in place.
+
+    Same arithmetic as scaler.transform (subtract mean_, divide by scale_),
+    without the DataFrame round trip.
+    """
+    names = list(getattr(scaler, "feature_names_in_", CONT_FEATURES))
+    idx = [columns.index(name) for name in names]
+    block = X[:, idx]
+    if scaler.with_mean:
+        block -= scaler.mean_
+    if scaler.with_std:
+        block /= scaler.scale_
+    X[:, idx] = block
+    return X
@@ -1,144 +1,710 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, make_response, stream_with_context
+import functools
+import hmac
 import joblib
-import pandas as pd
+import logging
+import numpy as np
 import os
+import threading
+import time
+import warnings
+
+import anytime
+import binary_codec
+import columnar
+import config
+import explain
+import intervals
+import streaming
+from artifacts import MODEL_PATH, artifact_digest
+from decision_grid import load_grid
+from features import CONT_FEATURES, REQUIRED_KEYS, build_feature_matrix, scale_features, select_rows
+from forest_engine import ARTIFACT_ENGINES, engine_artifacts, load_engine, n_trees
+from inference import RowPredictor
+from metrics import NULL_TIMER, Metrics, StageTimer, server_timing
+from microbatch import MicroBatcher
+from prediction_cache import PredictionCache
+from profiling import Profiler
+from request_log import RequestLog, parse_sample_rates
+from validation import check_record, invalid_rows, parse_records
 
 
 app = Flask(__name__)
+request_log = RequestLog(app.logger, config.LOG_LEVEL, config.LOG_QUEUE_SIZE,
+                         parse_sample_rates(config.LOG_SAMPLE_RATES))
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 # ---- Load model + scaler ----
-model = joblib.load(os.path.join(BASE_DIR, "best_model.pkl"))
 scaler = joblib.load(os.path.join(BASE_DIR, "scaler.pkl")) # we used StandardScaler on ['Age','Height','Weight','BMI']
+# The compact, surrogate and pruned engines need only their own artifact; a missing, stale
+# (or, for the surrogate, out-of-tolerance) one falls back to the pickled forest
+model = (None if config.INFERENCE_ENGINE in ARTIFACT_ENGINES
+         else joblib.load(os.path.join(BASE_DIR, "best_model.pkl")))
+engine = load_engine(model, config.INFERENCE_ENGINE, scaler, app.logger)  # same .predict contract as the model
+# Labels cached results for this worker's lifetime; the engine is never reloaded
+served_digest = artifact_digest(*engine_artifacts(config.INFERENCE_ENGINE))
 
-MODEL_COLUMNS = list(model.feature_names_in_)  # 18 columns used during training
-CONT_FEATURES = ['Age', 'Height', 'Weight', 'BMI']
-
-# Ten raw inputs expected from UI/API (we derive the rest)
-REQUIRED_KEYS = [
-    "Age",
-    "Diabetes",
-    "Blood_Pressure_Problems",
-    "Any_Transplants",
-    "Any_Chronic_Diseases",
-    "Height",
-    "Weight",
-    "Known_Allergies",
-    "History_of_Cancer_in_Family",
-    "Number_of_Major_Surgeries"
-]
+MODEL_COLUMNS = list(engine.feature_names_in_)  # 18 columns used during training
+input_scaler = None if getattr(engine, "raw_input", False) else scaler  # folded engines skip scaling
+row_predictor = RowPredictor(engine, input_scaler)
+decision_grid = load_grid(config.DECISION_GRID_DIR, app.logger) if config.DECISION_GRID_DIR else None
+prediction_cache = (PredictionCache(config.PREDICTION_CACHE_SIZE, served_digest)
+                    if config.PREDICTION_CACHE_SIZE > 0 else None)
+metrics = Metrics() if config.METRICS_ENABLED else None
+profiler = (Profiler(config.PROFILE_SAMPLE_RATE, config.PROFILE_DIR, config.PROFILE_DUMP_EVERY, app.logger)
+            if config.PROFILE_SAMPLE_RATE > 0 or config.PROFILE_ADMIN_TOKEN else None)
+micro_batcher = (MicroBatcher(engine.predict, config.MICROBATCH_WINDOW_MS, config.MICROBATCH_MAX_SIZE)
+                 if config.MICROBATCH_WINDOW_MS > 0 else None)
+explanation_cache = (PredictionCache(config.EXPLAIN_CACHE_SIZE, served_digest)
+                     if config.EXPLAIN_CACHE_SIZE > 0 else None)
+# best_model.pkl as the artifact engines verified it at startup; /explain unpickles it later
+model_digest = artifact_digest(MODEL_PATH) if model is None else None
+_explainer = None
+_explainer_lock = threading.Lock()
 
-@app.route("/", methods=["GET"])
-def home():
-    return jsonify({
+# Both paths hand model.predict a plain ndarray already in MODEL_COLUMNS order
+warnings.filterwarnings("ignore", message="X does not have valid feature names", category=UserWarning)
+
+# ---- Response bodies (shared by the Flask routes and asgi_app.py) ----
+def home_payload():
+    return {
         "status": "ok",
         "message": "Insurance Premium Prediction API",
         "required_keys": REQUIRED_KEYS
-    })
+    }
 
-@app.route("/health", methods=["GET"])
-def health():
-    return jsonify({
+
+def health_payload():
+    return {
         "status": "healthy",
         "model_columns": MODEL_COLUMNS,
-        "cont_features": CONT_FEATURES
-    })
+        "cont_features": CONT_FEATURES,
+        "engine": config.INFERENCE_ENGINE,
+        "logging": request_log.stats()
+    }
+
+
+def predict_payload(data, timer=NULL_TIMER, budget=None, spread=None):
+    """(body, status) for one /predict JSON object; raises on unexpected errors.
+
+    `timer` (metrics.StageTimer) is marked at the end of each stage.  With an
+    anytime.Budget the engine may stop early; the body then reports `trees_used`.
+    With an intervals.Spread the body adds the spread across trees (the cache
+    and grid only hold means, so the engine always runs).
+    """
+    # ---- Check presence, types and ranges; extract values ----
+    values, error = check_record(data)
+    timer.mark("validate")
+    if error is not None:
+        return {
+            "success": False,
+            "error": error,
+            "expected": REQUIRED_KEYS
+        }, 400
+    (age, diabetes, blood_pressure, any_transplant, any_chronic,
+     height, weight, known_allergies, history_cancer, num_surgeries) = values
+
+    # ---- Derived features ----
+    bmi = weight / ((height / 100.0) ** 2)
+    bmi_normal = 1 if 18.5 <= bmi < 25 else 0
+    bmi_overweight = 1 if 25 <= bmi < 30 else 0
+    bmi_obese = 1 if bmi >= 30 else 0
+
+    age_30_39 = 1 if 30 <= age <= 39 else 0
+    age_40_49 = 1 if 40 <= age <= 49 else 0
+    age_50_59 = 1 if 50 <= age <= 59 else 0
+    age_60_plus = 1 if age >= 60 else 0
+
+    # ---- Build row ----
+    row = {
+        'Age': age,
+        'Diabetes': diabetes,
+        'Blood_Pressure_Problems': blood_pressure,
+        'Any_Transplants': any_transplant,
+        'Any_Chronic_Diseases': any_chronic,
+        'Height': height,
+        'Weight': weight,
+        'Known_Allergies': known_allergies,
+        'History_of_Cancer_in_Family': history_cancer,
+        'Number_of_Major_Surgeries': num_surgeries,
+        'BMI': bmi,
+        'BMI_Category_Normal': bmi_normal,
+        'BMI_Category_Overweight': bmi_overweight,
+        'BMI_Category_Obese': bmi_obese,
+        'Age_Group_30-39': age_30_39,
+        'Age_Group_40-49': age_40_49,
+        'Age_Group_50-59': age_50_59,
+        'Age_Group_60+': age_60_plus
+    }
+    timer.mark("derive")
+
+    # ---- Predict: cache, then grid lookup, else scale + predict (preallocated row) ----
+    cache_key = None
+    pred = None
+    source = "cache"
+    complete = True  # cache and grid hold full-forest predictions
+    if prediction_cache is not None:
+        cache_key = prediction_cache.key(row[k] for k in REQUIRED_KEYS)
+        if spread is None:
+            pred = prediction_cache.get(cache_key)
+        timer.mark("cache")
+    if pred is None:
+        source = "grid"
+        pred = decision_grid.lookup(row) if decision_grid is not None and spread is None else None
+        timer.mark("grid")
+        if pred is None:
+            source = config.INFERENCE_ENGINE
+            X = row_predictor.fill(row)
+            timer.mark("build_scale")
+            if spread is not None:
+                mean, std, quantiles = intervals.predict(engine, X, spread)
+                pred = float(mean[0])
+                spread.reset(1)
+                spread.store(slice(None), std, quantiles)
+            elif budget is not None:
+                preds, used = anytime.predict(engine, X, budget)
+                pred = float(preds[0])
+                complete = used == n_trees(engine)
+            elif micro_batcher is not None:
+                pred = micro_batcher.predict(X[0].copy())
+            else:
+                pred = float(engine.predict(X)[0])
+            timer.mark("predict")
+        if cache_key is not None and complete:
+            prediction_cache.put(cache_key, pred)
+    if budget is not None and source != config.INFERENCE_ENGINE:
+        budget.record(n_trees(engine))
+
+    # ---- DEBUG LOGS (queued + sampled; only built when DEBUG is enabled) ----
+    if app.logger.isEnabledFor(logging.DEBUG):
+        app.logger.debug("predict", extra={"fields": {
+            "source": source,
+            "prediction": pred,
+            "row_columns": row_predictor.columns,
+            "scaler_expects": list(getattr(scaler, "feature_names_in_", CONT_FEATURES))
+        }})
+
+    body = {
+        "success": True,
+        "prediction": pred,
+        "derived": {
+            "BMI": round(bmi, 2),
+            "Age_Group_30-39": age_30_39,
+            "Age_Group_40-49": age_40_49,
+            "Age_Group_50-59": age_50_59,
+            "Age_Group_60+": age_60_plus
+        }
+    }
+    if budget is not None:
+        body["trees_used"] = budget.trees_used
+    if spread is not None:
+        body.update(spread.row(0))
+    return body, 200
+
+
+@app.route("/", methods=["GET"])
+def home():
+    return jsonify(home_payload())
+
+@app.route("/health", methods=["GET"])
+def health():
+    return jsonify(health_payload())
+
+def wants_premium(binary_request):
+    """Content negotiation for the response: binary when the request was binary
+    (unless Accept prefers JSON) or when Accept prefers the binary type."""
+    return prefers_premium(request.accept_mimetypes, binary_request)
+
+
+def prefers_premium(accept, binary_request):
+    """wants_premium for a parsed Accept header (werkzeug MIMEAccept); shared with asgi_app.py."""
+    offered = [binary_codec.PREMIUM_TYPE, "application/json"]
+    if not binary_request:
+        offered.reverse()
+    return accept.best_match(offered, default=offered[0]) == binary_codec.PREMIUM_TYPE
+
+
+def instrumented(endpoint):
+    """Count requests, errors and in-flight calls of a view in `metrics` and,
+    with SERVER_TIMING on, report its stage durations in a Server-Timing header."""
+    def wrap(view):
+        if metrics is None and not config.SERVER_TIMING:
+            return view
+
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            timer = metrics.start(endpoint) if metrics is not None else StageTimer()
+            status = 500
+            try:
+                response = make_response(view(*args, timer=timer, **kwargs))
+                status = response.status_code
+                timing = server_timing(timer) if config.SERVER_TIMING else ""
+                if timing:
+                    response.headers["Server-Timing"] = timing
+                return response
+            finally:
+                if metrics is not None:
+                    metrics.finish(endpoint, status, timer)
+        return wrapper
+    return wrap
+
+
+def profiled(view):
+    """Run a sampled fraction of calls under cProfile; the bare view when profiling is off."""
+    if profiler is None:
+        return view
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        return profiler.call(view, *args, **kwargs)
+    return wrapper
+
+
+def record_error(endpoint, kind):
+    if metrics is not None:
+        metrics.error(endpoint, kind)
+
+
+def scoring_options(params, started_ns):
+    """(anytime.Budget or None, intervals.Spread or None) from query parameters; ValueError when invalid."""
+    budget = anytime.parse_budget(params, started_ns)
+    spread = intervals.parse_spread(params)
+    if spread is not None:
+        if budget is not None:
+            raise ValueError("std/quantiles cannot be combined with max_latency_ms, min_trees or tolerance")
+        if not intervals.supported(engine):
+            raise ValueError(f"std/quantiles need per-tree predictions; "
+                             f"INFERENCE_ENGINE={config.INFERENCE_ENGINE} has none")
+    return budget, spread
+
+
+def trees_used_header(response, budget):
+    """X-Trees-Used on responses scored under an anytime budget (binary bodies have no room for it)."""
+    response = make_response(response)
+    if budget is not None and budget.trees_used is not None:
+        response.headers["X-Trees-Used"] = str(budget.trees_used)
+    return response
+
 
 @app.route("/predict", methods=["POST"])
-def predict():
+@instrumented("/predict")
+@profiled
+def predict(timer=NULL_TIMER):
+    started_ns = time.perf_counter_ns()
+    try:
+        binary = request.mimetype == binary_codec.RECORD_TYPE
+        if not binary and not request.is_json:
+            record_error("/predict", "content_type")
+            return jsonify({
+                "success": False,
+                "error": "Request must be JSON with header Content-Type: application/json"
+            }), 400
+
+        if binary:
+            try:
+                data = binary_codec.decode_record(request.get_data())
+            except ValueError as e:
+                record_error("/predict", "decode")
+                return jsonify({"success": False, "error": str(e)}), 400
+        else:
+            data = request.get_json(silent=True)  # malformed JSON -> None, a 400 below
+            if data is None:
+                record_error("/predict", "decode")
+                return jsonify({
+                    "success": False,
+                    "error": "Body must be a valid JSON object",
+                    "expected": REQUIRED_KEYS
+                }), 400
+        try:
+            budget, spread = scoring_options(request.args, started_ns)
+        except ValueError as e:
+            record_error("/predict", "options")
+            return jsonify({"success": False, "error": str(e)}), 400
+        timer.mark("parse")
+        body, status = predict_payload(data, timer, budget, spread)
+        if status != 200:
+            record_error("/predict", "validation")
+        if status == 200 and spread is None and wants_premium(binary):  # the spread only fits in JSON
+            response = Response(binary_codec.PREMIUM.pack(body["prediction"]), mimetype=binary_codec.PREMIUM_TYPE)
+        else:
+            response = make_response(jsonify(body), status)
+        timer.mark("serialize")
+        return trees_used_header(response, budget)
+
+    except Exception as e:
+        app.logger.exception("Prediction error")
+        record_error("/predict", type(e).__name__)
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+def score_records(records, errors=None, budget=None, spread=None):
+    """Vectorized scoring of a list of JSON-like records.
+
+    Returns (predictions, valid, errors): predictions is NaN where valid is
+    False, errors maps row index -> message.  `errors` may pre-seed failures
+    found before parsing (e.g. unreadable lines).  `budget` (anytime.Budget)
+    lets the engine stop early; `spread` (intervals.Spread) receives the
+    per-row spread across trees.
+    """
+    # ---- Coerce + validate per row ----
+    raw, parse_errors = parse_records(records)
+    errors = dict(errors or {})
+    for i, msg in parse_errors:
+        errors.setdefault(i, msg)
+    return score_raw(raw, len(records), errors, budget, spread)
+
+
+def score_raw(raw, n, errors, budget=None, spread=None):
+    """Predictions for n coerced rows - an (n, 10) array or {key: column} -
+    skipping the rows in `errors`.  Returns (predictions, valid, errors)."""
+    valid = np.ones(n, dtype=bool)
+    valid[list(errors)] = False
+
+    # ---- Decision grid first, then derive, scale and predict once for the rest ----
+    predictions = np.full(n, np.nan)
+    pending = valid.copy()
+    if spread is not None:
+        spread.reset(n)
+    if decision_grid is not None and spread is None and pending.any():
+        rows = np.flatnonzero(pending)
+        block = select_rows(raw, rows)
+        if isinstance(block, dict):
+            block = np.column_stack([block[key] for key in REQUIRED_KEYS]).astype(np.float64)
+        hits, on_grid = decision_grid.lookup_many(block)
+        predictions[rows[on_grid]] = hits[on_grid]
+        pending[rows[on_grid]] = False
+    if pending.any():
+        X = build_feature_matrix(select_rows(raw, pending), MODEL_COLUMNS)
+        if input_scaler is not None:
+            scale_features(X, MODEL_COLUMNS, input_scaler)
+        if spread is not None:
+            predictions[pending], std, quantiles = intervals.predict(engine, X, spread)
+            spread.store(pending, std, quantiles)
+        elif budget is not None:
+            predictions[pending], _ = anytime.predict(engine, X, budget)
+        else:
+            predictions[pending] = engine.predict(X)
+    elif budget is not None:
+        budget.record(n_trees(engine))
+    return predictions, valid, errors
+
+
+@app.route("/predict_batch", methods=["POST"])
+@instrumented("/predict_batch")
+def predict_batch(timer=NULL_TIMER):
+    started_ns = time.perf_counter_ns()
     try:
+        try:
+            budget, spread = scoring_options(request.args, started_ns)
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        if request.mimetype == columnar.ARROW_STREAM:
+            return trees_used_header(predict_batch_arrow(budget, spread), budget)
+        if request.mimetype == binary_codec.RECORD_TYPE:
+            return trees_used_header(predict_batch_binary(budget, spread), budget)
         if not request.is_json:
             return jsonify({
                 "success": False,
                 "error": "Request must be JSON with header Content-Type: application/json"
             }), 400
 
-        data = request.get_json()
+        data = request.get_json(silent=True)  # malformed JSON -> None, rejected with the wrong shapes
+        records = data.get("records") if isinstance(data, dict) else data
+        if not isinstance(records, list):
+            return jsonify({
+                "success": False,
+                "error": "Body must be a JSON array of records (or {\"records\": [...]})",
+                "expected": REQUIRED_KEYS
+            }), 400
+
+        if len(records) > config.MAX_BATCH_SIZE:
+            return jsonify({
+                "success": False,
+                "error": f"Batch of {len(records)} rows exceeds MAX_BATCH_SIZE={config.MAX_BATCH_SIZE}"
+            }), 413
+
+        predictions, valid, errors = score_records(records, budget=budget, spread=spread)
+        if spread is None and wants_premium(False):
+            return trees_used_header(premium_response(predictions, errors), budget)
+        return trees_used_header(jsonify(batch_body(predictions, valid, errors, budget, spread)), budget)
+
+    except Exception as e:
+        app.logger.exception("Batch prediction error")
+        record_error("/predict_batch", type(e).__name__)
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+def batch_body(predictions, valid, errors, budget=None, spread=None):
+    body = {
+        "success": True,
+        "count": len(predictions),
+        "predictions": [float(p) if v else None for p, v in zip(predictions, valid)],
+        "errors": [{"index": i, "error": errors[i]} for i in sorted(errors)]
+    }
+    if budget is not None:
+        body["trees_used"] = budget.trees_used
+    if spread is not None:
+        body.update(spread.columns(valid))
+    return body
+
+
+def premium_response(predictions, errors):
+    """Binary batch response: one float64 per row, NaN for failed rows."""
+    response = Response(binary_codec.encode_premiums(predictions), mimetype=binary_codec.PREMIUM_TYPE)
+    response.headers["X-Error-Count"] = str(len(errors))
+    return response
+
 
-        # ---- Check required keys ----
-        missing = [k for k in REQUIRED_KEYS if k not in data]
+def predict_batch_binary(budget=None, spread=None):
+    """Packed records in (binary_codec.py) -> float64 predictions (or JSON, per Accept)."""
+    try:
+        cols, n = binary_codec.decode_records(request.get_data())
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    if n > config.MAX_BATCH_SIZE:
+        return jsonify({
+            "success": False,
+            "error": f"Batch of {n} rows exceeds MAX_BATCH_SIZE={config.MAX_BATCH_SIZE}"
+        }), 413
+
+    predictions, valid, errors = score_raw(cols, n, dict(invalid_rows(cols)), budget, spread)
+    if spread is None and wants_premium(True):
+        return premium_response(predictions, errors)
+    return jsonify(batch_body(predictions, valid, errors, budget, spread))
+
+
+def predict_batch_arrow(budget=None, spread=None):
+    """Arrow IPC stream in -> the same batches plus prediction/error columns out."""
+    try:
+        batches = columnar.read_stream(request.get_data())
+    except RuntimeError as e:  # pyarrow not installed
+        return jsonify({"success": False, "error": str(e)}), 415
+    except Exception as e:
+        return jsonify({"success": False, "error": f"Invalid Arrow IPC stream: {e}"}), 400
+    if not batches:
+        return jsonify({"success": False, "error": "Arrow stream has no record batches"}), 400
+
+    names = batches[0].schema.names
+    missing = [k for k in REQUIRED_KEYS if k not in names]
+    if missing:
+        return jsonify({"success": False, "error": f"Missing columns: {missing}", "expected": REQUIRED_KEYS}), 400
+    rows = sum(batch.num_rows for batch in batches)
+    if rows > config.MAX_BATCH_SIZE:
+        return jsonify({
+            "success": False,
+            "error": f"Batch of {rows} rows exceeds MAX_BATCH_SIZE={config.MAX_BATCH_SIZE}"
+        }), 413
+
+    scored = []
+    for batch in batches:
+        cols, errors = columnar.feature_columns(batch)
+        predictions, valid, errors = score_raw(cols, batch.num_rows, errors, budget, spread)
+        extra = spread.arrays() if spread is not None else {}
+        scored.append(columnar.with_predictions(batch, predictions, valid, errors, extra))
+    extra_names = list(spread.arrays()) if spread is not None else []
+    body = columnar.write_stream(scored, columnar.output_schema(batches[0].schema, extra_names))
+    return Response(body, mimetype=columnar.ARROW_STREAM)
+
+
+@app.route("/predict_stream", methods=["POST"])
+@instrumented("/predict_stream")
+def predict_stream(timer=NULL_TIMER):
+    """Score an NDJSON or CSV upload chunk by chunk, streaming results back."""
+    mimetype = request.mimetype
+    if mimetype in ("application/x-ndjson", "application/jsonl", "application/json-seq"):
+        lines = streaming.iter_lines(request.stream)
+        records = streaming.ndjson_records(lines)
+        out_type, write, abort = streaming.NDJSON, streaming.ndjson_lines, streaming.ndjson_abort
+    elif mimetype == "text/csv":
+        lines = streaming.iter_lines(request.stream)
+        columns, missing = streaming.csv_header(lines)
         if missing:
             return jsonify({
                 "success": False,
-                "error": f"Missing keys: {missing}",
+                "error": f"CSV header is missing columns: {missing}",
                 "expected": REQUIRED_KEYS
             }), 400
+        records = streaming.csv_records(lines, columns)
+        out_type, write, abort = streaming.CSV, streaming.csv_lines, streaming.csv_abort
+    else:
+        return jsonify({
+            "success": False,
+            "error": "Content-Type must be application/x-ndjson or text/csv"
+        }), 415
 
-        # ---- Extract values ----
-        age = int(data["Age"])
-        diabetes = int(data["Diabetes"])
-        blood_pressure = int(data["Blood_Pressure_Problems"])
-        any_transplant = int(data["Any_Transplants"])
-        any_chronic = int(data["Any_Chronic_Diseases"])
-        height = float(data["Height"])
-        weight = float(data["Weight"])
-        known_allergies = int(data["Known_Allergies"])
-        history_cancer = int(data["History_of_Cancer_in_Family"])
-        num_surgeries = int(data["Number_of_Major_Surgeries"])
-
-        # ---- Derived features ----
-        bmi = weight / ((height / 100.0) ** 2)
-        bmi_normal = 1 if 18.5 <= bmi < 25 else 0
-        bmi_overweight = 1 if 25 <= bmi < 30 else 0
-        bmi_obese = 1 if bmi >= 30 else 0
-
-        age_30_39 = 1 if 30 <= age <= 39 else 0
-        age_40_49 = 1 if 40 <= age <= 49 else 0
-        age_50_59 = 1 if 50 <= age <= 59 else 0
-        age_60_plus = 1 if age >= 60 else 0
-
-        # ---- Build row ----
-        row = {
-            'Age': age,
-            'Diabetes': diabetes,
-            'Blood_Pressure_Problems': blood_pressure,
-            'Any_Transplants': any_transplant,
-            'Any_Chronic_Diseases': any_chronic,
-            'Height': height,
-            'Weight': weight,
-            'Known_Allergies': known_allergies,
-            'History_of_Cancer_in_Family': history_cancer,
-            'Number_of_Major_Surgeries': num_surgeries,
-            'BMI': bmi,
-            'BMI_Category_Normal': bmi_normal,
-            'BMI_Category_Overweight': bmi_overweight,
-            'BMI_Category_Obese': bmi_obese,
-            'Age_Group_30-39': age_30_39,
-            'Age_Group_40-49': age_40_49,
-            'Age_Group_50-59': age_50_59,
-            'Age_Group_60+': age_60_plus
-        }
+    def generate():
+        if out_type == streaming.CSV:
+            yield ",".join(streaming.CSV_HEADER) + "\n"
+        start = 0
+        try:
+            for chunk in streaming.iter_chunks(records, config.STREAM_CHUNK_ROWS):
+                line_errors = {i: err for i, (_, err) in enumerate(chunk) if err is not None}
+                predictions, valid, errors = score_records([rec for rec, _ in chunk], line_errors)
+                yield write(start, predictions, valid, errors)
+                start += len(chunk)
+        except Exception as e:  # headers are already sent: report in-band and stop
+            app.logger.exception("Stream prediction error")
+            record_error("/predict_stream", type(e).__name__)
+            yield abort(f"Stream aborted after {start} rows: {e}")
 
-        df = pd.DataFrame([row])
-        df = df.reindex(columns=MODEL_COLUMNS, fill_value=0)  
+    return Response(stream_with_context(generate()), mimetype=out_type)
 
-        # ---- DEBUG LOGS ----
-        print("Incoming DF columns:", list(df.columns))
-        print("Scaler expects:", getattr(scaler, "feature_names_in_", CONT_FEATURES))
 
-        # ---- Scale ----
-        df[CONT_FEATURES] = scaler.transform(df[CONT_FEATURES])
+def get_explainer():
+    """explain.TreeExplainer for best_model.pkl, built on the first /explain call
+    (the compact, surrogate and pruned engines start without the pickled forest)."""
+    global _explainer
+    if _explainer is None:
+        with _explainer_lock:
+            if _explainer is None:
+                forest = model
+                if forest is None:
+                    forest = joblib.load(MODEL_PATH)
+                    if artifact_digest(MODEL_PATH) != model_digest:
+                        raise RuntimeError("best_model.pkl changed since this worker started; "
+                                           "restart it to explain the new model")
+                _explainer = explain.TreeExplainer(forest)
+    return _explainer
 
-        # ---- Predict ----
-        pred = float(model.predict(df)[0])
 
-        return jsonify({
-            "success": True,
-            "prediction": pred,
-            "derived": {
-                "BMI": round(bmi, 2),
-                "Age_Group_30-39": age_30_39,
-                "Age_Group_40-49": age_40_49,
-                "Age_Group_50-59": age_50_59,
-                "Age_Group_60+": age_60_plus
-            }
-        })
+def explain_raw(raw, valid):
+    """(n, n_columns) SHAP values for the valid rows of an (n, 10) raw array
+    (NaN elsewhere); only inputs missing from explanation_cache are computed."""
+    explainer = get_explainer()
+    phi = np.full((len(raw), len(explainer.columns)), np.nan)
+    rows = np.flatnonzero(valid)
+    keys = None
+    if explanation_cache is not None:
+        keys = [explanation_cache.key(raw[i].tolist()) for i in rows]
+        cached = [explanation_cache.get(key) for key in keys]
+        for i, values in zip(rows, cached):
+            if values is not None:
+                phi[i] = values
+        missing = np.array([values is None for values in cached], dtype=bool)
+        keys = [key for key, miss in zip(keys, missing) if miss]
+        rows = rows[missing]
+    if rows.size:
+        # The explainer is the sklearn forest, so it always gets scaled features
+        X = scale_features(build_feature_matrix(raw[rows], explainer.columns), explainer.columns, scaler)
+        phi[rows] = explainer.shap_values(X)
+        if keys is not None:
+            for i, key in zip(rows, keys):
+                explanation_cache.put(key, phi[i].copy())
+    return phi
+
+
+def explanation(explainer, phi):
+    """JSON body of one row's SHAP values: per raw input and per model column."""
+    return {
+        "prediction": explainer.expected_value + float(phi.sum()),
+        "contributions": dict(zip(REQUIRED_KEYS, explainer.raw_values(phi).tolist())),
+        "feature_contributions": dict(zip(explainer.columns, phi.tolist()))
+    }
+
+
+@app.route("/explain", methods=["POST"])
+@instrumented("/explain")
+def explain_endpoint(timer=NULL_TIMER):
+    """TreeSHAP attributions of best_model.pkl for one JSON object, or for a
+    batch as a JSON array (or {"records": [...]})."""
+    try:
+        if not request.is_json:
+            record_error("/explain", "content_type")
+            return jsonify({
+                "success": False,
+                "error": "Request must be JSON with header Content-Type: application/json"
+            }), 400
+
+        data = request.get_json(silent=True)  # malformed JSON -> None, rejected with the wrong shapes
+        single = isinstance(data, dict) and "records" not in data
+        records = [data] if single else (data.get("records") if isinstance(data, dict) else data)
+        if not isinstance(records, list):
+            record_error("/explain", "validation")
+            return jsonify({
+                "success": False,
+                "error": "Body must be a JSON object, or an array of them (or {\"records\": [...]})",
+                "expected": REQUIRED_KEYS
+            }), 400
+        if len(records) > config.EXPLAIN_MAX_BATCH_SIZE:
+            return jsonify({
+                "success": False,
+                "error": f"Batch of {len(records)} rows exceeds "
+                         f"EXPLAIN_MAX_BATCH_SIZE={config.EXPLAIN_MAX_BATCH_SIZE}"
+            }), 413
+
+        raw, errors = parse_records(records)
+        timer.mark("validate")
+        if single and errors:
+            record_error("/explain", "validation")
+            return jsonify({"success": False, "error": errors[0][1], "expected": REQUIRED_KEYS}), 400
+        valid = np.ones(len(records), dtype=bool)
+        valid[[i for i, _ in errors]] = False
+        explainer = get_explainer()
+        phi = explain_raw(raw, valid)
+        timer.mark("explain")
+
+        if single:
+            response = jsonify({"success": True, "base_value": explainer.expected_value,
+                                **explanation(explainer, phi[0])})
+        else:
+            response = jsonify({
+                "success": True,
+                "count": len(records),
+                "base_value": explainer.expected_value,
+                "explanations": [explanation(explainer, p) if v else None for p, v in zip(phi, valid)],
+                "errors": [{"index": i, "error": msg} for i, msg in errors]
+            })
+        timer.mark("serialize")
+        return response
 
     except Exception as e:
-        app.logger.exception("Prediction error")
+        app.logger.exception("Explanation error")
+        record_error("/explain", type(e).__name__)
         return jsonify({"success": False, "error": str(e)}), 500
 
 
+@app.route("/cache/stats", methods=["GET"])
+def cache_stats():
+    if prediction_cache is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **prediction_cache.stats()})
+
+
+if profiler is not None and config.PROFILE_ADMIN_TOKEN:
+    @app.route("/admin/profile", methods=["GET", "POST"])
+    def admin_profile():
+        """GET: sampling status.  POST {"rate": r, "reset": bool, "dump": bool}: change it."""
+        token = request.headers.get("X-Admin-Token", "")
+        if not hmac.compare_digest(token.encode(), config.PROFILE_ADMIN_TOKEN.encode()):
+            return jsonify({"success": False, "error": "Invalid or missing X-Admin-Token"}), 403
+        if request.method == "POST":
+            options = request.get_json(silent=True)
+            if not isinstance(options, dict):
+                options = {}
+            try:
+                rate = options.get("rate")
+                profiler.configure(None if rate is None else float(rate), bool(options.get("reset")))
+            except (TypeError, ValueError) as e:
+                return jsonify({"success": False, "error": str(e)}), 400
+            if options.get("dump"):
+                profiler.dump()
+        return jsonify({"success": True, **profiler.stats()})
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    if metrics is None:
+        return jsonify({"enabled": False})
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/batching/stats", methods=["GET"])
+def batching_stats():
+    if micro_batcher is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **micro_batcher.stats()})
+
+
 if __name__ == "__main__":
     app.run(debug=True)
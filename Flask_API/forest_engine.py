@@ -0,0 +1,395 @@
+# File: forest_engine.py
+# Flattened-array inference for the deployed RandomForestRegressor.
+#
+# The fitted forest is converted once into contiguous node arrays (feature,
+# threshold, left, right, value) covering every tree.  A batch is then scored
+# by walking all trees in lock-step: each step is a handful of vectorized
+# gathers over an (n_rows, n_trees) matrix of node indices, instead of
+# sklearn's per-tree Python dispatch, input validation and joblib threads.
+#
+# Predictions are bit-for-bit equal to model.predict (with n_jobs=1):
+#   * features are compared as float32, exactly like sklearn's tree code
+#   * leaf values are summed tree by tree in estimator order, then divided
+#     by n_estimators
+#
+# The lock-step walk costs NumPy dispatch per level and row, which sklearn's
+# compiled traversal does not: past ~200 rows per call it is the slower one.
+# A forest built from the fitted model keeps its sklearn trees and scores
+# calls above FLAT_MAX_ROWS rows through them, summed in the same estimator
+# order, so both paths give identical predictions.
+#
+# fold_scaler() additionally rewrites the thresholds into raw (unscaled)
+# units so the compiled forest can skip scaler.transform at request time.
+
+import os
+
+import numpy as np
+
+import config
+
+ENGINES = ("sklearn", "flat", "folded", "compact", "surrogate", "pruned")
+ARTIFACT_ENGINES = ("folded", "compact", "surrogate", "pruned")  # need best_model.pkl only as a fallback
+
+
+class FlatForest:
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth,
+                 feature_names_in_, input_dtype=np.float32, raw_input=False, chunk_rows=256,
+                 estimators=None, max_rows=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.feature_names_in_ = np.asarray(feature_names_in_, dtype=object)
+        self.n_features_in_ = len(feature_names_in_)
+        self.input_dtype = np.dtype(input_dtype)  # dtype features are cast to before comparing
+        self.raw_input = raw_input  # True once the scaler is folded into the thresholds
+        self.chunk_rows = chunk_rows  # rows per lock-step pass; keeps the index matrix in cache
+        self.estimators = estimators  # the same trees as fitted sklearn estimators, or None
+        self.max_rows = config.FLAT_MAX_ROWS if max_rows is None else max_rows  # larger calls use them
+        # children[2 * node + go_right] is the next node; one gather per step
+        self.children = np.column_stack([left, right]).ravel()
+
+    @classmethod
+    def from_model(cls, model, **kwargs):
+        feature, threshold, left, right, value, roots = [], [], [], [], [], []
+        offset = 0
+        for est in model.estimators_:
+            tree = est.tree_
+            n = tree.node_count
+            is_leaf = tree.children_left == -1
+            own = np.arange(offset, offset + n)
+            # Leaves point at themselves so extra lock-step iterations are no-ops
+            feature.append(np.where(is_leaf, 0, tree.feature))
+            threshold.append(np.where(is_leaf, np.inf, tree.threshold))
+            left.append(np.where(is_leaf, own, tree.children_left + offset))
+            right.append(np.where(is_leaf, own, tree.children_right + offset))
+            value.append(tree.value[:, 0, 0])
+            roots.append(offset)
+            offset += n
+        return cls(
+            feature=np.concatenate(feature).astype(np.intp),
+            threshold=np.concatenate(threshold).astype(np.float64),
+            left=np.concatenate(left).astype(np.intp),
+            right=np.concatenate(right).astype(np.intp),
+            value=np.concatenate(value).astype(np.float64),
+            roots=np.asarray(roots, dtype=np.intp),
+            max_depth=max(est.tree_.max_depth for est in model.estimators_),
+            feature_names_in_=list(model.feature_names_in_),
+            **{"estimators": list(model.estimators_), **kwargs}
+        )
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        with np.load(path, allow_pickle=False) as data:
+            arrays = {key: data[key] for key in ("feature", "threshold", "left", "right", "value", "roots")}
+            return cls(
+                max_depth=int(data["max_depth"]),
+                feature_names_in_=list(data["feature_names_in_"]),
+                input_dtype=str(data["input_dtype"]),
+                raw_input=bool(data["raw_input"]),
+                **arrays,
+                **kwargs
+            )
+
+    def save(self, path, **extra):
+        """Write the arrays to an .npz; `extra` arrays (e.g. a digest) are stored alongside."""
+        np.savez(
+            path,
+            feature=self.feature, threshold=self.threshold, left=self.left, right=self.right,
+            value=self.value, roots=self.roots, max_depth=self.max_depth,
+            feature_names_in_=self.feature_names_in_.astype(str),
+            input_dtype=self.input_dtype.name, raw_input=self.raw_input,
+            **extra
+        )
+
+    @property
+    def n_estimators(self):
+        return len(self.roots)
+
+    @property
+    def node_count(self):
+        return len(self.feature)
+
+    def apply(self, X, roots=None):
+        """Leaf node index (global) reached by each row in each tree, (n, n_trees).
+        `roots` restricts the walk to those trees (default: all)."""
+        roots = self.roots if roots is None else roots
+        X = np.ascontiguousarray(X, dtype=self.input_dtype)  # float32 unless folded
+        n, n_features = X.shape
+        flat_X = X.ravel()
+        base = (np.arange(n, dtype=np.intp) * n_features)[:, None]
+        nodes = np.broadcast_to(roots, (n, len(roots))).copy()
+        for _ in range(self.max_depth):
+            x = flat_X[base + self.feature[nodes]]
+            nodes = self.children[2 * nodes + (x > self.threshold[nodes])]
+        return nodes
+
+    def tree_values(self, X, roots=None):
+        """Per-tree predictions, (n, n_trees)."""
+        return self.value[self.apply(X, roots)]
+
+    def uses_estimators(self, n_rows):
+        return self.estimators is not None and n_rows > self.max_rows
+
+    def predict(self, X):
+        X = np.asarray(X)
+        if self.uses_estimators(X.shape[0]):
+            return _estimators_mean(self.estimators, X)
+        out = np.empty(X.shape[0])
+        for start in range(0, X.shape[0], self.chunk_rows):
+            stop = start + self.chunk_rows
+            out[start:stop] = tree_mean(self.tree_values(X[start:stop]))
+        return out
+
+
+def tree_mean(values):
+    """Mean of (n, n_trees) per-tree predictions, in the same accumulation
+    order as RandomForestRegressor.predict."""
+    total = np.zeros(values.shape[0])
+    for t in range(values.shape[1]):
+        total += values[:, t]
+    total /= values.shape[1]
+    return total
+
+
+def _estimators_mean(estimators, X):
+    """Mean of the sklearn trees' predictions, accumulated like tree_mean."""
+    X32 = np.ascontiguousarray(X, dtype=np.float32)  # what each sklearn tree casts to
+    total = np.zeros(X32.shape[0])
+    for est in estimators:
+        total += est.predict(X32, check_input=False)
+    total /= len(estimators)
+    return total
+
+
+def n_trees(engine):
+    """Trees in a forest engine, None for engines without per-tree predictions."""
+    if isinstance(engine, FlatForest):
+        return engine.n_estimators
+    if hasattr(engine, "estimators_"):
+        return len(engine.estimators_)
+    return None
+
+
+def per_tree_values(engine, X, start=0, stop=None):
+    """(n, stop - start) predictions of trees start..stop of a forest engine
+    (FlatForest, or a fitted forest through its estimators_); large X goes
+    through the sklearn trees when the FlatForest has them."""
+    if isinstance(engine, FlatForest) and not engine.uses_estimators(len(X)):
+        roots = engine.roots[start:stop]
+        step = engine.chunk_rows
+        if len(X) <= step:
+            return engine.tree_values(X, roots)
+        out = np.empty((len(X), len(roots)))
+        for row in range(0, len(X), step):
+            out[row:row + step] = engine.tree_values(X[row:row + step], roots)
+        return out
+    estimators = (engine.estimators if isinstance(engine, FlatForest) else engine.estimators_)[start:stop]
+    X32 = np.ascontiguousarray(X, dtype=np.float32)  # what each sklearn tree casts to
+    out = np.empty((len(estimators), len(X)))  # tree-major, so each tree's column is contiguous
+    for values, est in zip(out, estimators):
+        values[:] = est.predict(X32, check_input=False)
+    return out.T
+
+
+def _ordered(x):
+    """float64 -> int64 keys with the same ordering (an involution, so also the inverse)."""
+    bits = np.asarray(x, dtype=np.float64).view(np.int64)
+    return bits ^ ((bits >> 63) & np.int64(0x7FFFFFFFFFFFFFFF))
+
+
+def _from_ordered(key):
+    return _ordered(key.view(np.float64)).view(np.float64)
+
+
+def fold_scaler(forest, scaler):
+    """Return a copy of `forest` that takes raw (unscaled) float64 features.
+
+    A split tests float32((x - mean) / scale) <= t.  That expression is
+    non-decreasing in x, so the set of raw x sending a row left is exactly
+    x <= T, with T the largest float64 that still passes.  T is found per node
+    by bisection over the ordered float64 bit patterns, which makes the folded
+    forest agree with scaler + model on every finite input, not just
+    approximately.  Unscaled columns get the same treatment for their float32
+    cast, so the compiled forest compares plain float64 values everywhere.
+    """
+    columns = list(forest.feature_names_in_)
+    n_features = len(columns)
+    mean = np.zeros(n_features)
+    scale = np.ones(n_features)
+    is_scaled = np.zeros(n_features, dtype=bool)
+    names = list(getattr(scaler, "feature_names_in_", []))
+    for k, name in enumerate(names):
+        j = columns.index(name)
+        is_scaled[j] = True
+        if scaler.with_mean:
+            mean[j] = scaler.mean_[k]
+        if scaler.with_std:
+            scale[j] = scaler.scale_[k]
+
+    internal = forest.left != np.arange(forest.node_count)
+    f = forest.feature[internal]
+    t = forest.threshold[internal]
+    m, s, sc = mean[f], scale[f], is_scaled[f]
+
+    def goes_left(x):
+        with np.errstate(over="ignore"):  # float32(huge) -> inf, still ordered
+            z = np.where(sc, (x - m) / s, x)
+            return z.astype(np.float32) <= t
+
+    biggest = np.finfo(np.float64).max
+    lo = np.full(len(t), _ordered(-biggest))  # invariant: goes_left(lo) once bracketed
+    hi = np.full(len(t), _ordered(biggest))   # invariant: not goes_left(hi) once bracketed
+    none_left = ~goes_left(np.full(len(t), -biggest))
+    all_left = goes_left(np.full(len(t), biggest))
+    for _ in range(66):
+        mid = (lo >> 1) + (hi >> 1) + (lo & hi & 1)
+        ok = goes_left(_from_ordered(mid))
+        lo = np.where(ok, mid, lo)
+        hi = np.where(ok, hi, mid)
+    raw_t = _from_ordered(lo)
+    raw_t[none_left] = -np.inf
+    raw_t[all_left] = np.inf
+
+    threshold = forest.threshold.copy()
+    threshold[internal] = raw_t
+    return FlatForest(
+        feature=forest.feature, threshold=threshold, left=forest.left, right=forest.right,
+        value=forest.value, roots=forest.roots, max_depth=forest.max_depth,
+        feature_names_in_=list(columns), input_dtype=np.float64, raw_input=True,
+        chunk_rows=forest.chunk_rows
+    )
+
+
+def _node_depths(left, right, roots, max_depth):
+    """Depth of every node reachable from `roots` (-1 for the rest)."""
+    depth = np.full(len(left), -1, dtype=np.intp)
+    depth[roots] = 0
+    internal = left != np.arange(len(left))
+    for d in range(max_depth):
+        frontier = np.flatnonzero((depth == d) & internal)
+        depth[left[frontier]] = d + 1
+        depth[right[frontier]] = d + 1
+    return depth
+
+
+def truncate(forest, n_trees, depth=None):
+    """A new FlatForest with the first `n_trees` trees of `forest`, each cut
+    at `depth`: nodes at that depth become leaves predicting their own value
+    (the training mean of the samples that reached them), and nodes below are
+    dropped.  Needs the per-node values of internal nodes, i.e. a forest built
+    with FlatForest.from_model.
+    """
+    depth = forest.max_depth if depth is None else min(depth, forest.max_depth)
+    stop = forest.roots[n_trees] if n_trees < forest.n_estimators else forest.node_count
+    roots = forest.roots[:n_trees]
+    own = np.arange(stop)
+    left, right = forest.left[:stop], forest.right[:stop]
+    node_depth = _node_depths(left, right, roots, forest.max_depth)
+    keep = (node_depth >= 0) & (node_depth <= depth)
+    cut = (node_depth == depth) & (left != own)
+    new_id = np.cumsum(keep) - 1
+    return FlatForest(
+        feature=np.where(cut, 0, forest.feature[:stop])[keep],
+        threshold=np.where(cut, np.inf, forest.threshold[:stop])[keep],
+        left=new_id[np.where(cut, own, left)[keep]],
+        right=new_id[np.where(cut, own, right)[keep]],
+        value=forest.value[:stop][keep],
+        roots=new_id[roots],
+        max_depth=depth,
+        feature_names_in_=list(forest.feature_names_in_),
+        input_dtype=forest.input_dtype, raw_input=forest.raw_input, chunk_rows=forest.chunk_rows
+    )
+
+
+def engine_artifacts(name):
+    """Files an engine of this name is built from: best_model.pkl and scaler.pkl
+    (artifact engines are checked against them, or fall back to them), plus the
+    engine's own artifact when it exists."""
+    from artifacts import MODEL_PATH, SCALER_PATH
+
+    own = {"folded": config.COMPILED_MODEL_PATH, "compact": config.COMPACT_MODEL_PATH, "surrogate": config.SURROGATE_PATH,
+           "pruned": config.PRUNED_MODEL_PATH}.get(name)
+    return (MODEL_PATH, SCALER_PATH) + ((own,) if own and os.path.exists(own) else ())
+
+
+def load_engine(model, name="flat", scaler=None, app_logger=None):
+    """Return an object with .predict / .feature_names_in_ for the chosen engine.
+
+    The "folded" engine expects unscaled features (engine.raw_input is True);
+    it is read from compile_model.py's verified artifact, or else folded here
+    from `model` and `scaler`.  The compact, surrogate and pruned engines are
+    read from their own artifact and fall back to "flat".  Reasons an artifact
+    cannot be used are logged to `app_logger`; `model` may be None for these
+    engines, and best_model.pkl is then only unpickled for the fallback.
+    """
+    if name not in ENGINES:
+        raise ValueError(f"Unknown inference engine {name!r}; expected one of {ENGINES}")
+    engine = None
+    if name == "folded":  # compile_model.py's output when it is current
+        from compile_model import load_compiled
+        engine = load_compiled(config.COMPILED_MODEL_PATH, app_logger)
+    elif name == "compact":  # same forest as "flat", read from compact_model.bin when it is current
+        from compact_model import load_compact
+        engine = load_compact(config.COMPACT_MODEL_PATH, app_logger)
+    elif name == "surrogate":  # distill.py's model when it is current and within tolerance
+        from distill import load_surrogate
+        engine = load_surrogate(config.SURROGATE_PATH, app_logger=app_logger)
+    elif name == "pruned":  # prune_forest.py's export when it is current
+        from prune_forest import load_pruned
+        engine = load_pruned(config.PRUNED_MODEL_PATH, app_logger)
+    if engine is not None:
+        return engine
+    if model is None:
+        import joblib
+
+        from artifacts import MODEL_PATH
+        model = joblib.load(MODEL_PATH)
+    if name == "sklearn":
+        return model
+    if name == "folded":
+        return fold_scaler(FlatForest.from_model(model), scaler)
+    return FlatForest.from_model(model)
+
+
+if __name__ == "__main__":
+    # Offline check: python forest_engine.py
+    import os
+    import time
+
+    import joblib
+
+    from features import REQUIRED_KEYS, build_feature_matrix, scale_features
+
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    model = joblib.load(os.path.join(base_dir, "best_model.pkl"))
+    scaler = joblib.load(os.path.join(base_dir, "scaler.pkl"))
+    model.set_params(n_jobs=1)  # deterministic summation order for the reference
+    columns = list(model.feature_names_in_)
+
+    csv_path = os.path.join(base_dir, "..", "Jupyter Notebooks", "Question & Data", "insurance.csv")
+    raw = np.loadtxt(csv_path, delimiter=",", skiprows=1, usecols=range(len(REQUIRED_KEYS)))
+    rng = np.random.default_rng(0)
+    random_raw = np.column_stack([
+        rng.integers(18, 67, 20000), rng.integers(0, 2, (20000, 4)),
+        rng.uniform(145, 188, 20000), rng.uniform(51, 132, 20000),
+        rng.integers(0, 2, (20000, 2)), rng.integers(0, 4, 20000)
+    ]).astype(np.float64)
+
+    engine = FlatForest.from_model(model)
+    lockstep = FlatForest.from_model(model, estimators=None)  # every call through the lock-step walk
+    for label, data in (("insurance.csv", raw), ("random", random_raw)):
+        X = scale_features(build_feature_matrix(data, columns), columns, scaler)
+        timings = {}
+        for name, fn in (("sklearn", model.predict), ("flat", engine.predict), ("lockstep", lockstep.predict)):
+            start = time.perf_counter()
+            got = fn(X)
+            timings[name] = time.perf_counter() - start
+            if name == "sklearn":
+                expected = got
+            assert np.array_equal(expected, got), f"{label}: {name} differs from model.predict"
+        print(f"{label:<14} rows={len(X):<6} identical  "
+              + "  ".join(f"{name}={seconds:.3f}s" for name, seconds in timings.items()))
@@ -0,0 +1,31 @@
+# File: gunicorn.conf.py
+# Gunicorn settings for Flask_API (picked up automatically from this directory).
+#
+# With GUNICORN_PRELOAD=1 (default) the master imports flask_app once, so the
+# model, scaler, flattened forest and decision grid are loaded a single time
+# and shared copy-on-write by every forked worker.  The GC is kept off while
+# the master imports the app; once it is loaded the heap is frozen and the GC
+# turned back on (the master runs for the whole deployment), and whatever the
+# master allocated since is frozen again right before each fork, so
+# collections in the workers never write to (and un-share) those pages.
+
+import gc
+import os
+
+# bind / workers keep gunicorn's defaults ($PORT, $WEB_CONCURRENCY)
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") == "1"
+
+if preload_app:
+    gc.disable()  # no collections in the master while the app is imported
+
+
+def when_ready(server):
+    # Runs after the preloaded import and before the first worker is spawned
+    if preload_app:
+        gc.freeze()  # move every object tracked so far into the permanent generation
+        gc.enable()  # workers inherit this state
+
+
+def pre_fork(server, worker):
+    if preload_app:
+        gc.freeze()  # also freeze what the master allocated since (e.g. before a respawn)
@@ -0,0 +1,51 @@
+# File: inference.py
+# Pandas-free single-row path for /predict: column positions and scaler
+# constants are resolved once at load time, each request only fills a
+# preallocated float64 row.
+
+import threading
+
+import numpy as np
+
+from features import CONT_FEATURES
+
+
+class RowPredictor:
+    def __init__(self, model, scaler):
+        self.model = model
+        self.columns = list(model.feature_names_in_)
+
+        affine = {}
+        if scaler is not None:  # None: the engine takes raw features (scaler folded in)
+            names = list(getattr(scaler, "feature_names_in_", CONT_FEATURES))
+            mean = scaler.mean_ if scaler.with_mean else np.zeros(len(names))
+            scale = scaler.scale_ if scaler.with_std else np.ones(len(names))
+            affine = {name: (float(m), float(s)) for name, m, s in zip(names, mean, scale)}
+
+        # (position, column, mean, scale) - mean/scale are None for unscaled columns
+        self._slots = [(j, name) + affine.get(name, (None, None))
+                       for j, name in enumerate(self.columns)]
+        self._local = threading.local()  # one row buffer per worker thread
+
+    def _row(self):
+        row = getattr(self._local, "row", None)
+        if row is None:
+            row = self._local.row = np.zeros((1, len(self.columns)))
+        return row
+
+    def fill(self, values):
+        """Write a feature dict into this thread's row, scaling CONT_FEATURES.
+
+        (x - mean) / scale on Python floats is the same IEEE arithmetic as
+        StandardScaler.transform, so the row matches the DataFrame path exactly.
+        Columns missing from `values` are 0, as with df.reindex(fill_value=0).
+        """
+        row = self._row()
+        out = row[0]
+        for j, name, mean, scale in self._slots:
+            x = values.get(name, 0)
+            out[j] = x if mean is None else (x - mean) / scale
+        return row
+
+    def predict(self, values):
+        return float(self.model.predict(self.fill(values))[0])
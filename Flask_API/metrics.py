@@ -0,0 +1,195 @@
+# File: metrics.py
+# Per-stage latency histograms, request/error counters and in-flight gauges,
+# rendered in the Prometheus text format at /metrics.
+#
+# Every thread records into its own shard (lists, dicts and arrays that no
+# other thread writes), so recording takes no lock; a scrape sums the shards.
+# The numbers are per process: with several gunicorn workers each worker
+# reports its own.
+
+import threading
+from time import perf_counter_ns
+
+import numpy as np
+
+# Stages a request can mark, in /predict's order; histograms are kept per
+# endpoint, so each endpoint's stages stay apart.  "build_scale" fills the
+# model row and standardizes it in one pass (the row path has no separate
+# DataFrame build / reindex / scaler.transform steps any more); /explain marks
+# validate, explain and serialize.
+STAGES = ("parse", "validate", "derive", "cache", "grid", "build_scale", "predict", "serialize", "explain")
+
+# Histogram upper bounds in seconds (the last bucket is +Inf)
+BUCKETS = (5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3,
+           5e-3, 1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0, 2.5)
+_BOUNDS_NS = np.array([round(b * 1e9) for b in BUCKETS], dtype=np.int64)
+_STAGE_INDEX = {stage: j for j, stage in enumerate(STAGES)}
+_START = 15  # stage code of a timer's first entry; real stages are 0..len(STAGES)-1
+_FOLD_EVERY = 2048  # queued marks a thread collects before folding them into its histograms
+
+
+class _Shard:
+    """One thread's counters.  Finished timers are queued and folded into
+    the histograms in batches, so the per-request cost is a list extend."""
+
+    def __init__(self):
+        # endpoint -> (counts, sums in ns, queued timer entries not yet in counts/sums),
+        # each replaced as a whole by fold() so a scrape always sees a consistent triple
+        self.hist = {}
+        self.requests = {}  # (endpoint, status) -> n
+        self.errors = {}  # (endpoint, type) -> n
+        self.in_flight = {}  # endpoint -> started - finished on this thread
+
+    def fold(self, endpoint):
+        """Bucket the endpoint's queued entries into new arrays (owning thread only)."""
+        counts, sums, pending = self.hist[endpoint]
+        self.hist[endpoint] = _bucket(counts.copy(), sums.copy(), pending) + ([],)
+
+
+def _empty_hist():
+    return np.zeros((len(STAGES), len(BUCKETS) + 1), dtype=np.int64), np.zeros(len(STAGES), dtype=np.int64)
+
+
+def _bucket(counts, sums, entries):
+    """Add the stage durations in queued timer entries to counts/sums in place."""
+    if len(entries) > 1:
+        packed = np.array(entries, dtype=np.int64)
+        stage, t = packed[1:] & 15, packed >> 4
+        durations = np.diff(t)
+        keep = stage != _START  # the step into a timer's first entry is not a stage
+        stage, durations = stage[keep], durations[keep]
+        np.add.at(counts, (stage, np.searchsorted(_BOUNDS_NS, durations)), 1)
+        np.add.at(sums, stage, durations)
+    return counts, sums
+
+
+class StageTimer:
+    """Timestamps of one request; mark(stage) closes the stage that started
+    at the previous mark (or at creation).  Each entry is one int,
+    perf_counter_ns() << 4 | stage code, so queuing a finished timer is a
+    single list extend and bucketing is vectorized."""
+    __slots__ = ("log",)
+
+    def __init__(self):
+        self.log = [perf_counter_ns() << 4 | _START]
+
+    def mark(self, stage):
+        self.log.append(perf_counter_ns() << 4 | _STAGE_INDEX[stage])
+
+    @property
+    def stages(self):
+        """[(stage, seconds)] in the order they were marked."""
+        out = []
+        for prev, entry in zip(self.log, self.log[1:]):
+            out.append((STAGES[entry & 15], ((entry >> 4) - (prev >> 4)) / 1e9))
+        return out
+
+
+def server_timing(timer):
+    """Server-Timing header value for a timer's stages (durations in ms)."""
+    return ", ".join(f"{stage};dur={seconds * 1e3:.3f}" for stage, seconds in timer.stages)
+
+
+class _NullTimer:
+    """Stand-in when metrics are off: mark() does nothing."""
+    __slots__ = ()
+    stages = ()
+
+    def mark(self, stage):
+        pass
+
+
+NULL_TIMER = _NullTimer()
+
+
+class Metrics:
+    def __init__(self, prefix="premium_api"):
+        self.prefix = prefix
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()  # only taken when a thread records for the first time
+
+    def _shard(self):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = _Shard()
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    # ---- Recording (request threads) ----
+    def start(self, endpoint):
+        """Count a request as in flight and return its StageTimer."""
+        shard = self._shard()
+        shard.in_flight[endpoint] = shard.in_flight.get(endpoint, 0) + 1
+        return StageTimer()
+
+    def finish(self, endpoint, status, timer=None):
+        shard = self._shard()
+        shard.in_flight[endpoint] -= 1
+        key = (endpoint, status)
+        shard.requests[key] = shard.requests.get(key, 0) + 1
+        if timer is not None:
+            hist = shard.hist.get(endpoint)
+            if hist is None:
+                hist = shard.hist[endpoint] = _empty_hist() + ([],)
+            pending = hist[2]
+            pending.extend(timer.log)
+            if len(pending) >= _FOLD_EVERY:
+                shard.fold(endpoint)
+
+    def error(self, endpoint, kind):
+        shard = self._shard()
+        key = (endpoint, kind)
+        shard.errors[key] = shard.errors.get(key, 0) + 1
+
+    # ---- Scrape ----
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            shards = list(self._shards)
+        hists = {}  # endpoint -> (counts, sums) over all shards
+        requests, errors, in_flight = {}, {}, {}
+        for shard in shards:
+            for endpoint, (shard_counts, shard_sums, pending) in list(shard.hist.items()):
+                counts, sums = hists.setdefault(endpoint, _empty_hist())
+                counts += shard_counts
+                sums += shard_sums
+                # read-only: bucket a copy of the shard's queue here instead of folding it
+                _bucket(counts, sums, list(pending))
+            for totals, part in ((requests, shard.requests), (errors, shard.errors),
+                                 (in_flight, shard.in_flight)):
+                for key, n in list(part.items()):
+                    totals[key] = totals.get(key, 0) + n
+
+        p = self.prefix
+        lines = [f"# HELP {p}_stage_seconds Time spent in each stage of a request, by endpoint.",
+                 f"# TYPE {p}_stage_seconds histogram"]
+        for endpoint, (counts, sums) in sorted(hists.items()):
+            for j, stage in enumerate(STAGES):
+                if not counts[j].any():  # a stage this endpoint never marks
+                    continue
+                labels = f'endpoint="{endpoint}",stage="{stage}"'
+                running = 0
+                for bound, n in zip(BUCKETS + ("+Inf",), counts[j]):
+                    running += n
+                    le = bound if isinstance(bound, str) else repr(bound)
+                    lines.append(f'{p}_stage_seconds_bucket{{{labels},le="{le}"}} {running}')
+                lines.append(f'{p}_stage_seconds_sum{{{labels}}} {int(sums[j]) / 1e9!r}')
+                lines.append(f'{p}_stage_seconds_count{{{labels}}} {running}')
+
+        lines += [f"# HELP {p}_requests_total Finished requests by endpoint and status.",
+                  f"# TYPE {p}_requests_total counter"]
+        for (endpoint, status), n in sorted(requests.items()):
+            lines.append(f'{p}_requests_total{{endpoint="{endpoint}",status="{status}"}} {n}')
+
+        lines += [f"# HELP {p}_errors_total Failed requests by endpoint and error type.",
+                  f"# TYPE {p}_errors_total counter"]
+        for (endpoint, kind), n in sorted(errors.items()):
+            lines.append(f'{p}_errors_total{{endpoint="{endpoint}",type="{kind}"}} {n}')
+
+        lines += [f"# HELP {p}_in_flight Requests currently being handled.",
+                  f"# TYPE {p}_in_flight gauge"]
+        for endpoint, n in sorted(in_flight.items()):
+            lines.append(f'{p}_in_flight{{endpoint="{endpoint}"}} {n}')
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,138 @@
+# File: microbatch.py
+# Micro-batching for concurrent single-row predictions.
+#
+# Request threads hand their prepared feature row to a dispatcher thread and
+# wait.  The dispatcher takes the first waiting row, keeps collecting for up to
+# `window_ms` or until `max_batch` rows are queued, runs one vectorized
+# predict over the stacked rows and wakes every waiter with its own result.
+
+import os
+import queue
+import threading
+import time
+from bisect import bisect_left
+
+import numpy as np
+
+
+class Histogram:
+    """Fixed-bucket counts; bounds are upper edges, the last bucket is +Inf."""
+
+    def __init__(self, bounds):
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0.0
+        self.max = 0.0
+        self.n = 0
+
+    def observe(self, value):  # only called from the dispatcher thread
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self.n += 1
+
+    def quantile(self, q):
+        """Upper bucket edge below which a fraction q of observations fall
+        (the largest value seen when that is past the last bound)."""
+        if not self.n:
+            return 0.0
+        target = q * self.n
+        running = 0
+        for bound, count in zip(self.bounds, self.counts):
+            running += count
+            if running >= target:
+                return min(bound, self.max)
+        return self.max
+
+    def snapshot(self):
+        return {
+            "buckets": [[b, c] for b, c in zip(self.bounds + ["+Inf"], self.counts)],
+            "count": self.n,
+            "mean": self.total / self.n if self.n else 0.0,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99)
+        }
+
+
+class _Pending:
+    __slots__ = ("row", "enqueued", "done", "result", "error")
+
+    def __init__(self, row):
+        self.row = row
+        self.enqueued = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    def __init__(self, predict_fn, window_ms=2.0, max_batch=64, timeout=30.0):
+        self.predict_fn = predict_fn  # (n, n_features) float64 -> (n,) predictions
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self.batch_sizes = Histogram([1, 2, 4, 8, 16, 32, 64, 128, 256])
+        self.queue_delay_ms = Histogram([0.1, 0.25, 0.5, 1, 2, 5, 10, 25, 50, 100])
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._owner_pid = None  # dispatcher is started lazily, once per (forked) process
+
+    def _ensure_dispatcher(self):
+        if self._owner_pid == os.getpid():
+            return
+        with self._lock:
+            if self._owner_pid != os.getpid():
+                self._queue = queue.Queue()
+                threading.Thread(target=self._run, name="microbatch", daemon=True).start()
+                self._owner_pid = os.getpid()
+
+    def predict(self, row):
+        """Blocking: one feature row in, one float out (batched with concurrent callers)."""
+        self._ensure_dispatcher()
+        pending = _Pending(row)
+        self._queue.put(pending)
+        if not pending.done.wait(self.timeout):
+            raise TimeoutError(f"Micro-batch prediction timed out after {self.timeout}s")
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0
+                             else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect(self._queue.get())
+            started = time.perf_counter()
+            for pending in batch:
+                self.queue_delay_ms.observe((started - pending.enqueued) * 1000.0)
+            self.batch_sizes.observe(len(batch))
+            try:
+                preds = self.predict_fn(np.vstack([p.row for p in batch]))
+                for pending, pred in zip(batch, preds):
+                    pending.result = float(pred)
+            except Exception as e:  # every waiter gets the failure, the dispatcher keeps running
+                for pending in batch:
+                    pending.error = e
+            for pending in batch:
+                pending.done.set()
+
+    def stats(self):
+        return {
+            "window_ms": self.window * 1000.0,
+            "max_batch": self.max_batch,
+            "queued": self._queue.qsize(),
+            "batch_size": self.batch_sizes.snapshot(),
+            "queue_delay_ms": self.queue_delay_ms.snapshot()
+        }
@@ -0,0 +1,62 @@
+# File: prediction_cache.py
+# Bounded, thread-safe LRU cache for /predict, keyed on the coerced ten-field
+# input tuple plus a digest of the artifacts the worker loaded at startup.
+#
+# A worker never reloads its engine, so that digest stays right for the
+# worker's lifetime: replacing an artifact on disk takes effect with new
+# workers (and new caches), never by relabelling predictions of the old one.
+
+import threading
+from collections import OrderedDict
+
+
+class PredictionCache:
+    def __init__(self, capacity, digest):
+        self.capacity = capacity
+        self.digest = digest  # artifacts behind every cached value (artifacts.artifact_digest)
+        self._data = OrderedDict()
+        self._lock = threading.Lock()  # gunicorn --threads shares one cache per worker
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, values):
+        """Cache key for the coerced inputs (REQUIRED_KEYS order)."""
+        return (self.digest,) + tuple(values)
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if self.capacity <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.capacity:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "capacity": self.capacity,
+                "size": len(self._data),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "digest": self.digest
+            }
@@ -0,0 +1,123 @@
+# File: profiling.py
+# Opt-in cProfile sampling of live /predict calls.
+#
+# A Profiler runs a random fraction of calls under their own cProfile.Profile,
+# one call at a time: a sampled call that finds another one being profiled
+# runs unprofiled and is counted as skipped.  That lock is what keeps samples
+# apart.  Up to Python 3.11 a profile only sees its own thread, but from 3.12
+# cProfile is built on sys.monitoring, which is per interpreter: a second
+# enable() raises, and a sample also records whatever other threads run
+# meanwhile.  Samples are added to a single pstats.Stats, written to
+# <dir>/predict-<pid>.prof every `dump_every` samples and whenever sampling is
+# stopped.  The pid is the current worker's, taken at dump time (with
+# GUNICORN_PRELOAD the Profiler is built in the master), and a failed dump is
+# logged, never raised into the request that triggered it.  Read the file with
+# `python -m pstats` or snakeviz.  Without a Profiler (PROFILE_SAMPLE_RATE=0
+# and no PROFILE_ADMIN_TOKEN) flask_app does not wrap the view at all.
+
+import cProfile
+import logging
+import os
+import pstats
+import random
+import threading
+
+
+class Profiler:
+    def __init__(self, rate, out_dir, dump_every=100, app_logger=None):
+        self.rate = rate  # fraction of calls profiled; 0 = paused
+        self.out_dir = out_dir
+        self.dump_every = max(1, dump_every)
+        self.logger = app_logger or logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._profiling = threading.Lock()  # held while a call is profiled
+        self._stats = None  # pstats.Stats of every sample since the last reset
+        self.samples = 0
+        self.skipped = 0  # sampled calls run unprofiled because another one was being profiled
+        self.dumps = 0
+        self.dump_errors = 0
+
+    @property
+    def path(self):
+        return os.path.join(self.out_dir, f"predict-{os.getpid()}.prof")
+
+    def call(self, fn, *args, **kwargs):
+        """fn(*args, **kwargs), profiled with probability `rate`."""
+        if not self.rate or random.random() >= self.rate:
+            return fn(*args, **kwargs)
+        if not self._profiling.acquire(blocking=False):
+            with self._lock:
+                self.skipped += 1
+            return fn(*args, **kwargs)
+        try:
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:  # a profiler outside this class is active (3.12+: one per interpreter)
+                with self._lock:
+                    self.skipped += 1
+                return fn(*args, **kwargs)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                profile.disable()
+                self._add(profile)
+        finally:
+            self._profiling.release()
+
+    def _add(self, profile):
+        with self._lock:
+            if self._stats is None:
+                self._stats = pstats.Stats(profile)
+            else:
+                self._stats.add(profile)
+            self.samples += 1
+            if self.samples % self.dump_every == 0:
+                self._dump()
+
+    def _dump(self):  # caller holds _lock
+        """Write the stats; returns the path, or None before any sample or on failure (logged)."""
+        if self._stats is None:
+            return None
+        path = self.path
+        tmp = f"{path}.tmp"  # per pid, like path
+        try:
+            os.makedirs(self.out_dir, exist_ok=True)
+            self._stats.dump_stats(tmp)
+            os.replace(tmp, path)  # readers never see a half-written file
+        except Exception:
+            self.dump_errors += 1
+            self.logger.exception("Could not write profile %s", path)
+            return None
+        self.dumps += 1
+        return path
+
+    # ---- Control (admin endpoint) ----
+    def dump(self):
+        """Write the aggregated stats now; returns the path (None before any sample or on failure)."""
+        with self._lock:
+            return self._dump()
+
+    def configure(self, rate=None, reset=False):
+        """Change the sample rate (0 pauses and dumps) and/or drop collected samples."""
+        with self._lock:
+            if rate is not None:
+                if not 0 <= rate <= 1:
+                    raise ValueError(f"rate must be between 0 and 1, got {rate}")
+                if not rate and self.rate:
+                    self._dump()
+                self.rate = rate
+            if reset:
+                self._stats = None
+                self.samples = self.skipped = 0
+
+    def stats(self):
+        return {
+            "rate": self.rate,
+            "samples": self.samples,
+            "skipped": self.skipped,
+            "dump_every": self.dump_every,
+            "dumps": self.dumps,
+            "dump_errors": self.dump_errors,
+            "path": self.path
+        }
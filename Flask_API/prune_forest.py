@@ -0,0 +1,166 @@
+# File: prune_forest.py
+# Latency vs accuracy of truncated forests: the first k trees of
+# best_model.pkl, for every k, at several depth caps (a capped node predicts
+# the training mean stored on it).
+#
+# Accuracy is measured on the held-out split of insurance.csv
+# (train_test_split(test_size=0.2, random_state=42) - the notebooks do not
+# record the split, so this is the conventional one), both against the real
+# premiums (RMSE, R²) and against the full forest (fidelity RMSE).  Latency
+# is the single-row FlatForest predict time, i.e. what an uncached /predict
+# pays.  The Pareto frontier (no other configuration is both faster and more
+# accurate) is printed, and any configuration can be exported as an .npz the
+# API serves with INFERENCE_ENGINE=pruned.
+#
+#   python prune_forest.py                              -> frontier (objective: RMSE vs premiums)
+#   python prune_forest.py --objective forest --csv all.csv
+#   python prune_forest.py --export 50:6                -> pruned_model.npz (first 50 trees, depth <= 6)
+#
+# --inputs raw scores without the StandardScaler, the way the forest was
+# fitted; it is a diagnostic only (the API always scales) and cannot export.
+
+import argparse
+import csv
+import os
+import time
+import warnings
+
+import joblib
+import numpy as np
+
+import config
+from artifacts import MODEL_PATH, SCALER_PATH, artifact_digest
+from features import REQUIRED_KEYS, build_feature_matrix, scale_features
+from forest_engine import FlatForest, truncate
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_CSV = os.path.join(BASE_DIR, "..", "Jupyter Notebooks", "Question & Data", "insurance.csv")
+DEPTHS = (None, 8, 6, 5, 4, 3, 2)
+
+warnings.filterwarnings("ignore", message="X does not have valid feature names", category=UserWarning)
+
+
+def holdout(columns, scaler, inputs="served"):
+    """(X, y) for the held-out 20% of insurance.csv."""
+    from sklearn.model_selection import train_test_split
+
+    data = np.loadtxt(DATA_CSV, delimiter=",", skiprows=1)
+    _, test = train_test_split(data, test_size=0.2, random_state=42)
+    X = build_feature_matrix(test[:, :len(REQUIRED_KEYS)], columns)
+    if inputs == "served":
+        scale_features(X, columns, scaler)
+    return X, test[:, len(REQUIRED_KEYS)]
+
+
+def row_latency(forest, row, repeat):
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            forest.predict(row)
+        best = min(best, (time.perf_counter() - start) / repeat)
+    return best
+
+
+def explore(forest, X, y, depths, k_step, repeat):
+    """One dict per (k, depth): accuracy on (X, y) and single-row latency."""
+    full = forest.predict(X)
+    sst = np.sum((y - y.mean()) ** 2)
+    ks = sorted(set(range(1, forest.n_estimators + 1, k_step)) | {forest.n_estimators})
+    results = []
+    for depth in depths:
+        capped = truncate(forest, forest.n_estimators, depth)
+        # running sums in estimator order: the same arithmetic as predicting with the first k trees
+        running = np.cumsum(capped.tree_values(X), axis=1)
+        for k in ks:
+            pred = running[:, k - 1] / k
+            results.append({
+                "trees": k,
+                "depth": depth or forest.max_depth,
+                "nodes": int(capped.roots[k] if k < capped.n_estimators else capped.node_count),
+                "rmse": float(np.sqrt(np.mean((pred - y) ** 2))),
+                "r2": float(1 - np.sum((pred - y) ** 2) / sst),
+                "fidelity_rmse": float(np.sqrt(np.mean((pred - full) ** 2))),
+                "row_us": row_latency(truncate(forest, k, depth), X[:1], repeat) * 1e6,
+            })
+    return results
+
+
+def pareto(results, objective):
+    """Configurations not beaten on both latency and `objective` by another one."""
+    frontier, best = [], float("inf")
+    for r in sorted(results, key=lambda r: (r["row_us"], r[objective])):
+        if r[objective] < best:
+            frontier.append(r)
+            best = r[objective]
+    return frontier
+
+
+def load_pruned(path=None, app_logger=None):
+    """Pruned FlatForest, or None if the file is missing or was cut from a different best_model.pkl."""
+    path = path or config.PRUNED_MODEL_PATH
+    if not os.path.exists(path):
+        if app_logger is not None:
+            app_logger.warning("Pruned model %s not found; run python prune_forest.py --export K:DEPTH", path)
+        return None
+    with np.load(path, allow_pickle=False) as data:
+        digest = str(data["digest"]) if "digest" in data else None
+    if digest != artifact_digest(MODEL_PATH):
+        if app_logger is not None:
+            app_logger.warning("Pruned model %s is stale (best_model.pkl changed); ignoring it", path)
+        return None
+    return FlatForest.load(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency/accuracy Pareto frontier of truncated forests")
+    parser.add_argument("--depths", nargs="+", default=[str(d) for d in DEPTHS],
+                        help="depth caps to try ('None' = uncapped)")
+    parser.add_argument("--k-step", type=int, default=1, help="try every k-th tree count (default: every k)")
+    parser.add_argument("--repeat", type=int, default=10, help="single-row predictions per latency sample")
+    parser.add_argument("--objective", choices=("rmse", "fidelity_rmse"), default="rmse",
+                        help="accuracy axis of the frontier: RMSE vs premiums or vs the full forest")
+    parser.add_argument("--inputs", choices=("served", "raw"), default="served")
+    parser.add_argument("--csv", help="write every configuration here")
+    parser.add_argument("--export", metavar="K:DEPTH", help="save the first K trees cut at DEPTH ('None' = uncapped)")
+    parser.add_argument("--out", default=config.PRUNED_MODEL_PATH)
+    args = parser.parse_args()
+
+    model = joblib.load(MODEL_PATH)
+    scaler = joblib.load(SCALER_PATH)
+    columns = list(model.feature_names_in_)
+    forest = FlatForest.from_model(model)
+    X, y = holdout(columns, scaler, args.inputs)
+
+    if args.export:
+        if args.inputs != "served":
+            raise SystemExit("--export serves scaled inputs; drop --inputs raw")
+        k, depth = args.export.split(":")
+        pruned = truncate(forest, int(k), None if depth == "None" else int(depth))
+        pred = pruned.predict(X)
+        print(f"first {k} trees, depth <= {pruned.max_depth}: {pruned.node_count} nodes "
+              f"({pruned.node_count / forest.node_count:.1%} of the forest), "
+              f"hold-out RMSE {np.sqrt(np.mean((pred - y) ** 2)):.1f}, "
+              f"fidelity RMSE {np.sqrt(np.mean((pred - forest.predict(X)) ** 2)):.1f}")
+        pruned.save(args.out, digest=artifact_digest(MODEL_PATH))
+        print(f"Saved {args.out}")
+        return
+
+    depths = [None if d == "None" else int(d) for d in args.depths]
+    results = explore(forest, X, y, depths, args.k_step, args.repeat)
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(results[0]))
+            writer.writeheader()
+            writer.writerows(results)
+
+    print(f"{len(results)} configurations on {len(y)} held-out rows ({args.inputs} inputs); "
+          f"Pareto frontier on {args.objective}:")
+    print(f"{'trees':>6}{'depth':>6}{'nodes':>8}{'1-row us':>10}{'RMSE':>10}{'R²':>8}{'fidelity':>10}")
+    for r in pareto(results, args.objective):
+        print(f"{r['trees']:>6}{r['depth']:>6}{r['nodes']:>8}{r['row_us']:>10.1f}{r['rmse']:>10.1f}"
+              f"{r['r2']:>8.3f}{r['fidelity_rmse']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+# File: request_log.py
+# Non-blocking structured logging for the API.
+#
+# Request threads only sample the record and put it on a bounded in-memory
+# queue (put_nowait); a QueueListener thread formats it as one JSON line and
+# does the actual write.  When the queue is full the record is dropped and
+# counted, so a slow stdout never stalls a prediction.
+
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage()
+        }
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep each record with probability rates[levelno] (default 1.0)."""
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+        self.sampled_out = 0
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        rate = self.rates.get(record.levelno, 1.0)
+        if rate >= 1.0 or random.random() < rate:
+            return True
+        with self._lock:
+            self.sampled_out += 1
+        return False
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that drops (and counts) instead of blocking when full."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def prepare(self, record):
+        # Formatting happens on the listener thread, not the request thread
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+
+def parse_sample_rates(spec):
+    """"DEBUG=0.01,INFO=0.5" -> {logging.DEBUG: 0.01, logging.INFO: 0.5}"""
+    rates = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        level, _, rate = part.partition("=")
+        levelno = logging.getLevelName(level.strip().upper())
+        if not isinstance(levelno, int):
+            raise ValueError(f"Unknown log level in LOG_SAMPLE_RATES: {level!r}")
+        rates[levelno] = float(rate)
+    return rates
+
+
+class RequestLog:
+    def __init__(self, logger, level="INFO", queue_size=10000, sample_rates=None, stream=None):
+        self.logger = logger
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.handler = DroppingQueueHandler(self.queue)
+        self.sampler = SamplingFilter(sample_rates or {})
+        self.handler.addFilter(self.sampler)
+
+        self.output = logging.StreamHandler(stream or sys.stdout)
+        self.output.setFormatter(JsonFormatter())
+        self.listener = QueueListener(self.queue, self.output, respect_handler_level=False)
+
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+        logger.addHandler(self.handler)
+        logger.setLevel(level)
+        logger.propagate = False
+
+        self.listener.start()
+        atexit.register(self.stop)
+        # Threads do not survive fork (gunicorn preload): give each child its own listener
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self.queue = queue.Queue(maxsize=self.queue.maxsize)
+        self.handler.queue = self.queue
+        self.handler.dropped = 0
+        self.sampler.sampled_out = 0
+        self.listener = QueueListener(self.queue, self.output, respect_handler_level=False)
+        self.listener.start()
+
+    def stop(self):
+        if self.listener._thread is not None:
+            self.listener.stop()  # flushes what is still queued
+
+    def stats(self):
+        return {
+            "level": logging.getLevelName(self.logger.level),
+            "queued": self.queue.qsize(),
+            "queue_size": self.queue.maxsize,
+            "dropped": self.handler.dropped,
+            "sampled_out": self.sampler.sampled_out,
+            "sample_rates": {logging.getLevelName(k): v for k, v in self.sampler.rates.items()}
+        }
@@ -0,0 +1,313 @@
+# File: score_file.py
+# Offline bulk scoring of insurance.csv-style files (CSV, Parquet or Arrow
+# IPC) with a process pool.
+#
+# The main process only cuts the file into blocks of --chunk-rows lines and
+# writes results back in input order.  Worker processes (one per core by
+# default) parse a block, run the same featurize -> scale -> model pipeline
+# as the API and return the block's output lines: each input line unchanged
+# with ",prediction,error" appended.
+#
+#   python score_file.py "../Jupyter Notebooks/Question & Data/insurance.csv" scored.csv
+#   python score_file.py in.csv out.csv --map Blood_Pressure=Blood_Pressure_Problems --workers 8
+#
+# Input columns are matched to the API keys ignoring case and underscores, so
+# both `BloodPressureProblems` (insurance.csv) and `Blood_Pressure_Problems`
+# headers work as-is; --map SOURCE=KEY (or --schema mapping.json) covers the rest.
+# One record per line (no newlines inside quoted fields).
+#
+# Parquet / Arrow IPC files (columnar.py, needs pyarrow) are read batch by
+# batch; workers get only the ten input columns and the output file is each
+# input batch unchanged plus prediction/error columns:
+#   python score_file.py applicants.parquet scored.parquet
+
+import argparse
+import csv
+import io
+import json
+import logging
+import os
+import sys
+import time
+import warnings
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice
+
+import numpy as np
+import pandas as pd
+
+import columnar
+from features import FLOAT_KEYS, REQUIRED_KEYS, build_feature_matrix, scale_features, select_rows
+from forest_engine import ENGINES
+from validation import invalid_rows
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _normalize(name):
+    return name.replace("_", "").replace(" ", "").lower()
+
+
+def resolve_schema(header, overrides=None):
+    """Map each REQUIRED_KEY to a column of `header`.
+
+    `overrides` is {source column: API key}; the remaining keys are matched
+    by name ignoring case, underscores and spaces.  Raises ValueError when a
+    key cannot be found.
+    """
+    overrides = overrides or {}
+    unknown = [key for key in overrides.values() if key not in REQUIRED_KEYS]
+    if unknown:
+        raise ValueError(f"--map targets must be API keys {REQUIRED_KEYS}, got {unknown}")
+    absent = [col for col in overrides if col not in header]
+    if absent:
+        raise ValueError(f"--map sources not in the file header: {absent}")
+
+    schema = {key: col for col, key in overrides.items()}
+    by_name = {_normalize(col): col for col in header}
+    for key in REQUIRED_KEYS:
+        if key not in schema and _normalize(key) in by_name:
+            schema[key] = by_name[_normalize(key)]
+    missing = [key for key in REQUIRED_KEYS if key not in schema]
+    if missing:
+        raise ValueError(f"No column for {missing}; header is {list(header)} (use --map SOURCE=KEY)")
+    return schema
+
+
+def parse_block(lines, header, schema):
+    """(n, 10) float64 inputs in REQUIRED_KEYS order plus {row: error}.
+
+    Fields are coerced by the API's rule (validation.coerce, vectorized):
+    any numeric text as a float, truncated to an integer for every key but
+    Height/Weight.  Rows that cannot be read
+    are left as NaN and get an error.
+    """
+    errors = {}
+    usecols = [schema[key] for key in REQUIRED_KEYS]
+    try:
+        # no names=: a row with extra fields raises instead of becoming an index
+        frame = pd.read_csv(io.StringIO("".join(lines)), header=None,
+                            keep_default_na=False, na_values=[""])
+        if frame.shape != (len(lines), len(header)):
+            raise ValueError("ragged block")
+        frame.columns = list(header)
+    except (ValueError, pd.errors.ParserError):
+        # slow path: a ragged row somewhere in the block - parse line by line
+        rows = []
+        for i, fields in enumerate(csv.reader(lines)):
+            if len(fields) != len(header):
+                errors[i] = f"Expected {len(header)} fields, got {len(fields)}"
+                fields = [""] * len(header)
+            rows.append(fields)
+        frame = pd.DataFrame(rows, columns=list(header))[usecols].replace("", None)
+
+    raw = np.empty((len(lines), len(REQUIRED_KEYS)))
+    for j, key in enumerate(REQUIRED_KEYS):
+        column = frame[schema[key]]
+        values = pd.to_numeric(column, errors="coerce").to_numpy(np.float64)
+        for i in np.flatnonzero(np.isnan(values)):
+            if pd.isna(column.iloc[i]):
+                errors.setdefault(int(i), f"{key}: missing value")
+            else:
+                errors.setdefault(int(i), f"{key}: could not convert {column.iloc[i]!r} to a number")
+        raw[:, j] = values if key in FLOAT_KEYS else np.trunc(values)
+    for i, msg in invalid_rows(raw):
+        errors.setdefault(i, msg)
+    return raw, errors
+
+
+def _csv_field(text):
+    return '"' + text.replace('"', '""') + '"' if text else ""
+
+
+# ---- Worker process ----
+_worker = {}
+
+
+def _init_worker(engine_name):
+    import joblib
+
+    from forest_engine import ARTIFACT_ENGINES, load_engine
+
+    warnings.filterwarnings("ignore", message="X does not have valid feature names", category=UserWarning)
+    model = None
+    if engine_name not in ARTIFACT_ENGINES:
+        model = joblib.load(os.path.join(BASE_DIR, "best_model.pkl"))
+        model.set_params(n_jobs=1)  # the pool already uses every core
+    scaler = joblib.load(os.path.join(BASE_DIR, "scaler.pkl"))
+    engine = load_engine(model, engine_name, scaler, logging.getLogger("score_file"))
+    _worker.update(
+        engine=engine,
+        scaler=None if getattr(engine, "raw_input", False) else scaler,
+        columns=list(engine.feature_names_in_)
+    )
+
+
+def _predict(raw, n, errors):
+    """Predictions for n rows of raw inputs (array or {key: column}), NaN where errors."""
+    predictions = np.full(n, np.nan)
+    ok = np.ones(n, dtype=bool)
+    ok[list(errors)] = False
+    if ok.any():
+        X = build_feature_matrix(select_rows(raw, ok), _worker["columns"])
+        if _worker["scaler"] is not None:
+            scale_features(X, _worker["columns"], _worker["scaler"])
+        predictions[ok] = _worker["engine"].predict(X)
+    return predictions
+
+
+def score_block(lines, header, schema):
+    """Output text for a block of input lines, plus its error count."""
+    raw, errors = parse_block(lines, header, schema)
+    predictions = _predict(raw, len(lines), errors)
+
+    out = []
+    for i, (line, pred) in enumerate(zip(lines, predictions.tolist())):
+        line = line.rstrip("\r\n")
+        if i in errors:
+            out.append(f"{line},,{_csv_field(errors[i])}\n")
+        else:
+            out.append(f"{line},{pred!r},\n")
+    return "".join(out), len(errors)
+
+
+def score_batch(batch, schema):
+    """(predictions, errors) for an Arrow record batch holding the input columns."""
+    cols, errors = columnar.feature_columns(batch, schema)
+    return _predict(cols, batch.num_rows, errors), errors
+
+
+# ---- Main process ----
+def parse_overrides(pairs, schema_file):
+    overrides = {}
+    if schema_file:
+        with open(schema_file) as f:
+            overrides.update(json.load(f))
+    for pair in pairs or []:
+        source, sep, key = pair.partition("=")
+        if not sep:
+            raise ValueError(f"--map expects SOURCE=KEY, got {pair!r}")
+        overrides[source.strip()] = key.strip()
+    return overrides
+
+
+def read_blocks(f, chunk_rows):
+    """Lists of up to chunk_rows non-blank lines."""
+    lines = (line for line in f if line.strip())
+    while True:
+        block = list(islice(lines, chunk_rows))
+        if not block:
+            return
+        yield block
+
+
+def run_pool(jobs, workers, engine, write):
+    """Submit (rows, fn, args, context) jobs to the pool and call
+    write(context, result) in submission order.  Returns (rows, errors)."""
+    inflight = deque()  # bounded, so only ~2 blocks per worker are ever in memory
+    rows = failed = 0
+    start = last_report = time.perf_counter()
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(engine,)) as pool:
+        def drain_one():
+            nonlocal rows, failed, last_report
+            n, context, future = inflight.popleft()
+            failed += write(context, future.result())
+            rows += n
+            now = time.perf_counter()
+            if now - last_report >= 5.0:
+                last_report = now
+                print(f"{rows:>12,} rows  {rows / (now - start):>10,.0f} rows/s", file=sys.stderr)
+
+        for n, fn, fn_args, context in jobs:
+            inflight.append((n, context, pool.submit(fn, *fn_args)))
+            if len(inflight) >= 2 * workers:
+                drain_one()
+        while inflight:
+            drain_one()
+    return rows, failed
+
+
+def score_csv(args, overrides):
+    src = open(args.input, newline="", encoding="utf-8-sig")
+    header_line = src.readline().rstrip("\r\n")
+    header = next(csv.reader([header_line]))
+    schema = resolve_schema(header, overrides)
+    out = sys.stdout if args.output == "-" else open(args.output, "w", newline="")
+    out.write(f"{header_line},prediction,error\n")
+
+    def write(_, result):
+        text, n_errors = result
+        out.write(text)
+        return n_errors
+
+    jobs = ((len(block), score_block, (block, header, schema), None)
+            for block in read_blocks(src, args.chunk_rows))
+    try:
+        return run_pool(jobs, args.workers, args.engine, write)
+    finally:
+        src.close()
+        if out is not sys.stdout:
+            out.close()
+
+
+def score_columnar(args, overrides):
+    """Parquet / Arrow IPC in, same format (by output extension) out; each
+    input batch is written back unchanged with prediction/error appended."""
+    columnar.require_pyarrow()
+    batches = columnar.read_batches(args.input, args.chunk_rows)
+    first = next(batches, None)
+    if first is None:
+        raise ValueError(f"{args.input} has no rows")
+    schema = resolve_schema(first.schema.names, overrides)
+    inputs = [schema[key] for key in REQUIRED_KEYS]
+    writer = columnar.open_writer(args.output, columnar.output_schema(first.schema))
+
+    def write(batch, result):
+        predictions, errors = result
+        valid = np.ones(batch.num_rows, dtype=bool)
+        valid[list(errors)] = False
+        writer.write_batch(columnar.with_predictions(batch, predictions, valid, errors))
+        return len(errors)
+
+    # workers only receive the ten input columns; the full batch stays here
+    jobs = ((batch.num_rows, score_batch, (batch.select(inputs), schema), batch)
+            for batch in chain([first], batches))
+    try:
+        return run_pool(jobs, args.workers, args.engine, write)
+    finally:
+        writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score an insurance.csv-style file in parallel")
+    parser.add_argument("input", help="CSV, Parquet or Arrow IPC file with the ten applicant inputs "
+                                      "(any extra columns are kept)")
+    parser.add_argument("output", help="file to write: input columns + prediction + error "
+                                       "('-' for CSV on stdout; .parquet/.arrow for columnar input)")
+    parser.add_argument("--map", action="append", metavar="SOURCE=KEY",
+                        help="map an input column to an API key (repeatable)")
+    parser.add_argument("--schema", help="JSON file {\"source column\": \"API key\", ...}")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-rows", type=int, default=20000)
+    parser.add_argument("--engine", default="sklearn", choices=ENGINES,
+                        help="as INFERENCE_ENGINE; all but surrogate and pruned give identical predictions")
+    args = parser.parse_args()
+
+    if columnar.is_columnar(args.input) != columnar.is_columnar(args.output):
+        raise SystemExit("Parquet/Arrow input needs a .parquet/.arrow output (and CSV input a CSV output)")
+    start = time.perf_counter()
+    try:
+        overrides = parse_overrides(args.map, args.schema)
+        run = score_columnar if columnar.is_columnar(args.input) else score_csv
+        rows, failed = run(args, overrides)
+    except (ValueError, RuntimeError) as e:
+        raise SystemExit(str(e))
+
+    elapsed = time.perf_counter() - start
+    print(f"Scored {rows:,} rows ({failed:,} with errors) in {elapsed:.1f}s with {args.workers} workers: "
+          f"{rows / elapsed:,.0f} rows/s ({rows / elapsed * 60 / 1e6:.2f}M rows/min)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# File: streaming.py
+# Readers and writers for the streaming scoring endpoint (/predict_stream).
+#
+# The upload is read in fixed-size byte blocks and split into lines, lines are
+# grouped into chunks of `chunk_rows` records, and each scored chunk is turned
+# back into output lines - so only one block and one chunk are ever held in
+# memory, however long the body is.  A stream that fails after the headers
+# went out ends with an abort trailer whose index is null (NDJSON) or empty
+# (CSV), so clients can tell it from a row's own error.
+
+import csv
+import io
+import json
+
+from features import REQUIRED_KEYS
+
+NDJSON = "application/x-ndjson"
+CSV = "text/csv"
+CSV_HEADER = ["index", "prediction", "error"]
+
+
+def iter_lines(stream, block_size=64 * 1024):
+    """Decoded lines (without the newline) from a binary stream read in blocks."""
+    tail = b""
+    first = True
+    while True:
+        block = stream.read(block_size)
+        if not block:
+            break
+        if first:
+            block = block[3:] if block.startswith(b"\xef\xbb\xbf") else block  # UTF-8 BOM
+            first = False
+        lines = (tail + block).split(b"\n")
+        tail = lines.pop()  # incomplete last line waits for the next block
+        for line in lines:
+            yield line.rstrip(b"\r").decode("utf-8", errors="replace")
+    if tail.rstrip(b"\r"):
+        yield tail.rstrip(b"\r").decode("utf-8", errors="replace")
+
+
+def iter_chunks(records, chunk_rows):
+    """Group an iterable of (record, error) pairs into lists of chunk_rows."""
+    chunk = []
+    for item in records:
+        chunk.append(item)
+        if len(chunk) >= chunk_rows:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def ndjson_records(lines):
+    """(record, error) per non-blank line; error is set when the line is not JSON."""
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line), None
+        except ValueError as e:
+            yield None, f"Invalid JSON: {e}"
+
+
+def csv_header(lines):
+    """Read the header row of a CSV body; returns (columns, missing required keys)."""
+    for line in lines:
+        if line.strip():
+            columns = [c.strip() for c in next(csv.reader([line]))]
+            return columns, [k for k in REQUIRED_KEYS if k not in columns]
+    return [], list(REQUIRED_KEYS)
+
+
+def csv_records(lines, columns):
+    """(record, error) per non-blank data row, keyed by the header columns."""
+    for line in lines:
+        if not line.strip():
+            continue
+        values = next(csv.reader([line]))
+        if len(values) != len(columns):
+            yield None, f"Expected {len(columns)} fields, got {len(values)}"
+            continue
+        yield dict(zip(columns, values)), None
+
+
+def ndjson_lines(start, predictions, valid, errors):
+    """One JSON line per row: {"index", "prediction"} or {"index", "error"}."""
+    out = []
+    for offset, (pred, ok) in enumerate(zip(predictions, valid)):
+        index = start + offset
+        if ok:
+            out.append(json.dumps({"index": index, "prediction": float(pred)}))
+        else:
+            out.append(json.dumps({"index": index, "error": errors[offset]}))
+    return "\n".join(out) + "\n"
+
+
+def csv_lines(start, predictions, valid, errors):
+    """index,prediction,error rows; prediction is empty for rows with an error."""
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    for offset, (pred, ok) in enumerate(zip(predictions, valid)):
+        if ok:
+            writer.writerow([start + offset, repr(float(pred)), ""])
+        else:
+            writer.writerow([start + offset, "", errors[offset]])
+    return buf.getvalue()
+
+
+def ndjson_abort(message):
+    """Trailer line for a stream that stopped early: {"index": null, "error"},
+    never confused with a row's error."""
+    return json.dumps({"index": None, "error": message}) + "\n"
+
+
+def csv_abort(message):
+    """CSV trailer for a stream that stopped early: empty index and prediction."""
+    buf = io.StringIO()
+    csv.writer(buf, lineterminator="\n").writerow(["", "", message])
+    return buf.getvalue()
@@ -0,0 +1,116 @@
+# File: validation.py
+# Presence, type and range checks for the ten required inputs.
+#
+# The bounds are the input ranges of the Streamlit app (Streamlit_APP/app.py),
+# which are also the ranges seen in insurance.csv.  check_record() coerces and
+# range-checks a record in one pass over _SPECS, and the same bounds as arrays
+# serve the vectorized check, so a bad request is rejected before any feature
+# or model work.  The field-by-field diagnosis only runs to word the error
+# message.
+#
+# Every input is read the same way whether it comes from JSON, NDJSON or a CSV
+# upload (or score_file.py): a number or numeric string, truncated to an
+# integer for all keys but Height/Weight, so 45, 45.9 and "45.0" are Age 45.
+
+import numpy as np
+
+from features import FLOAT_KEYS, REQUIRED_KEYS, raw_columns
+
+# key -> (low, high), inclusive
+BOUNDS = {
+    "Age": (18, 66),
+    "Diabetes": (0, 1),
+    "Blood_Pressure_Problems": (0, 1),
+    "Any_Transplants": (0, 1),
+    "Any_Chronic_Diseases": (0, 1),
+    "Height": (145, 188),
+    "Weight": (51, 132),
+    "Known_Allergies": (0, 1),
+    "History_of_Cancer_in_Family": (0, 1),
+    "Number_of_Major_Surgeries": (0, 3)
+}
+
+_SPECS = tuple((key, key not in FLOAT_KEYS) + BOUNDS[key] for key in REQUIRED_KEYS)  # key, integer, low, high
+LOWER = np.array([BOUNDS[key][0] for key in REQUIRED_KEYS], dtype=np.float64)
+UPPER = np.array([BOUNDS[key][1] for key in REQUIRED_KEYS], dtype=np.float64)
+
+
+def coerce(value, integer):
+    """One input value as a float, or truncated to an int for integer keys."""
+    value = float(value)
+    return int(value) if integer else value
+
+
+def _range_error(key, low, high, value):
+    return f"{key} must be between {low} and {high}, got {value}"
+
+
+def _diagnose(data):
+    """Message for the first problem in a record that failed the fast check."""
+    if not isinstance(data, dict):
+        return "Record must be a JSON object"
+    missing = [k for k in REQUIRED_KEYS if k not in data]
+    if missing:
+        return f"Missing keys: {missing}"
+    for key, integer, low, high in _SPECS:
+        try:
+            value = coerce(data[key], integer)
+        except (TypeError, ValueError, OverflowError):
+            return f"{key} must be a number, got {data[key]!r}"
+        if not low <= value <= high:  # also rejects NaN
+            return _range_error(key, low, high, value)
+    return "Invalid record"
+
+
+def check_record(data):
+    """Coerce and check one JSON object in a single pass.
+
+    Returns (values, None) with the ten values in REQUIRED_KEYS order
+    (Height/Weight as float, the rest int, like predict() always did), or
+    (None, message) for the first problem found.
+    """
+    values = []
+    try:
+        for key, integer, low, high in _SPECS:
+            value = coerce(data[key], integer)
+            if not low <= value <= high:  # also rejects NaN
+                return None, _diagnose(data)
+            values.append(value)
+    except Exception:
+        return None, _diagnose(data)
+    return values, None
+
+
+def parse_records(records):
+    """Coerce and check JSON records into an (n, 10) float64 array in
+    REQUIRED_KEYS order.
+
+    Returns (raw, errors) where errors is a list of (row_index, message);
+    rows that failed are left as NaN in raw.
+    """
+    raw = np.full((len(records), len(REQUIRED_KEYS)), np.nan)
+    errors = []
+    for i, rec in enumerate(records):
+        values, error = check_record(rec)
+        if error is None:
+            raw[i] = values
+        else:
+            errors.append((i, error))
+    return raw, errors
+
+
+def invalid_rows(raw):
+    """(row_index, message) for rows - of an (n, 10) array or {key: column} -
+    with a value outside BOUNDS (NaN and infinities included), checked for
+    all rows at once."""
+    cols = raw_columns(raw)
+    bad = np.vstack([~((cols[key] >= LOWER[j]) & (cols[key] <= UPPER[j]))
+                     for j, key in enumerate(REQUIRED_KEYS)])
+    rows = np.flatnonzero(bad.any(axis=0))
+    first = bad[:, rows].argmax(axis=0)  # first failing key per bad row
+    errors = []
+    for i, j in zip(rows.tolist(), first.tolist()):
+        key = REQUIRED_KEYS[j]
+        value = cols[key][i].item()
+        errors.append((i, _range_error(key, *BOUNDS[key], value)))
+    return errors